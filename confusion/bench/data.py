@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Generators of synthetic CFN text for benchmarks.
+
+"""
+
+
+def config(sections=1000, keys=10, depth=4, fanout=4):
+    """
+    Return CFN text for a configuration.
+
+    `sections`: the number of sections, one in ten of them a subtable of another.
+    `keys`: the number of options in each section.
+    `depth`: the length of each chain of references from one section to the next.
+    `fanout`: the number of options in DEFAULT, which every section inherits.
+
+    References are to whole TOML values, so the result is valid after interpolation.
+
+    """
+    rv = ["[DEFAULT]"]
+    for n in range(fanout):
+        if n % 3 == 1:
+            rv.append(f'shared_{n} = "${{shared_{n - 1}}}/{n}"')
+        elif n % 3 == 2 and keys:
+            # Refers to an option of each section which inherits it
+            rv.append(f'shared_{n} = "${{int_0}}:{n}"')
+        else:
+            rv.append(f"shared_{n} = {n}")
+
+    names = []
+    for i in range(sections):
+        name = f"S{i}" if i % 10 or not i else f"{names[i - 1]}.sub"
+        names.append(name)
+        rv.append("")
+        rv.append(f"[{name}]")
+        for k in range(keys):
+            kind = k % 4
+            if kind == 0:
+                rv.append(f"int_{k} = {i * keys + k}")
+            elif kind == 1:
+                rv.append(f'str_{k} = "value {i}.{k}"')
+            elif kind == 2:
+                rv.append(f"list_{k} = [{i}, {k}, {i + k}]")
+            else:
+                rv.append(f"flag_{k} = {'true' if (i + k) % 2 else 'false'}")
+        if depth > 1 and i % depth:
+            rv.append(f"ref = ${{{names[i - 1]}:ref}}")
+        else:
+            rv.append(f'ref = "root {i}"')
+    return "\n".join(rv)
+
+
+def graph(nodes, span=10):
+    """Return CFN text for a tree of nodes, with some colours and arcs."""
+    rv = []
+    paths = ["N0"]
+    for i in range(1, nodes):
+        paths.append(f"{paths[(i - 1) // span]}.N{i}")
+
+    for i, path in enumerate(paths):
+        rv.append(f"[{path}]")
+        rv.append(f'label = "Node {i}"')
+        if i % 3 == 0:
+            rv.append(f"color = {{r = {i % 256}, g = 0, b = 128}}")
+        if i % 7 == 0:
+            rv.append("fill = {r = 255, g = 255, b = 224}")
+        if i and i % 5 == 0:
+            rv.append(f"[{path}.link]")
+            rv.append(f'target = "{paths[i // 2]}"')
+    return "\n".join(rv)
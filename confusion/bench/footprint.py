@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Measures the memory taken by each node of a cfn2dot Model.
+
+Usage:
+
+    python -m confusion.bench.footprint --nodes 100000
+
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from confusion.bench.data import graph
+from confusion.parser import tomllib
+from confusion.utils.cfn2dot import Model
+
+
+def measure(text, **kwargs):
+    """Return the bytes allocated per node when the nodes of a Model are built."""
+    model = Model(text, tomllib.loads(text), **kwargs)
+    model.tables
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        nodes = model.nodes
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / len(nodes)
+
+
+def main(args):
+    text = graph(args.nodes)
+    for keep_data in (True, False):
+        label = "with data" if keep_data else "without data"
+        print(f"{label:<14} {measure(text, keep_data=keep_data):>8.0f} bytes/node", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--nodes", type=int, default=100000,
+        help="Set the number of nodes to generate."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
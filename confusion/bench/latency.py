@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Measures how long loading a configuration stalls an asyncio event loop.
+
+Usage:
+
+    python -m confusion.bench.latency --sections 5000
+
+A ticker wakes every millisecond while a generated file is loaded, once
+on the loop itself and once with Config.aload. The longest delay in waking
+is reported, along with the total time the loop was late.
+
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import tempfile
+import time
+
+from confusion.bench.data import config
+from confusion.config import Config
+
+
+async def ticker(stalls, done, period=0.001):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(period)
+        stalls.append(max(0, time.perf_counter() - start - period))
+
+
+async def measure(load):
+    """Return the longest stall and the total of stalls, in seconds, while `load` runs."""
+    stalls = []
+    done = asyncio.Event()
+    task = asyncio.ensure_future(ticker(stalls, done))
+    await asyncio.sleep(0.01)
+    stalls.clear()
+    try:
+        await load()
+    finally:
+        done.set()
+        await task
+    return max(stalls, default=0), sum(stalls)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as parent:
+        path = pathlib.Path(parent, "bench.cfn")
+        path.write_text(config(args.sections, args.keys))
+        print(f"Size {path.stat().st_size / 1e6:.1f} MB", file=sys.stderr)
+
+        async def blocking():
+            Config.load(path)
+
+        async def executor():
+            await Config.aload(path)
+
+        for name, load in (("blocking", blocking), ("aload", executor)):
+            worst, total = asyncio.run(measure(load))
+            print(f"{name:<10} max stall {worst * 1000:>8.1f} ms, total {total * 1000:>8.1f} ms", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--sections", type=int, default=5000,
+        help="Set the number of sections to generate."
+    )
+    rv.add_argument(
+        "--keys", type=int, default=10,
+        help="Set the number of options in each section."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
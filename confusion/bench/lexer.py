@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Compares the throughput of the CFN lexer with that of configparser's reader.
+
+Usage:
+
+    python -m confusion.bench.lexer --sections 20000
+
+"""
+
+import argparse
+import configparser
+import io
+import sys
+import time
+
+from confusion.bench.data import config
+from confusion.lexer import Lexer
+from confusion.parser import TOMLParser
+
+
+def measure(text, read, repeat=3):
+    """Return the best rate in megabytes per second over a number of runs."""
+    size = len(text.encode("utf-8")) / 1e6
+    rv = 0
+    for n in range(repeat):
+        parser = TOMLParser(interpolation=configparser.Interpolation())
+        start = time.perf_counter()
+        read(parser, io.StringIO(text), "bench.cfn")
+        rv = max(rv, size / (time.perf_counter() - start))
+    return rv
+
+
+def main(args):
+    text = config(args.sections, args.keys)
+    print(f"Size {len(text) / 1e6:.1f} MB", file=sys.stderr)
+    rates = {
+        "configparser": measure(text, configparser.RawConfigParser._read, args.repeat),
+        "lexer": measure(text, lambda parser, fp, name: Lexer(parser).read(fp, name), args.repeat),
+    }
+    for name, rate in rates.items():
+        print(f"{name:<12} {rate:>8.1f} MB/sec", file=sys.stdout)
+    print(f"{'speedup':<12} {rates['lexer'] / rates['configparser']:>8.2f}", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--sections", type=int, default=20000,
+        help="Set the number of sections to generate."
+    )
+    rv.add_argument(
+        "--keys", type=int, default=10,
+        help="Set the number of options in each section."
+    )
+    rv.add_argument(
+        "--repeat", type=int, default=3,
+        help="Set the number of runs to take the best of."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
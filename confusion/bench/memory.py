@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Compares the peak memory of loading a large CFN file from a string and as a stream.
+
+Usage:
+
+    python -m confusion.bench.memory --sections 200000
+
+Each loader runs in a fresh interpreter, since peak RSS can only grow.
+
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from confusion.config import Config
+
+
+def generate(path, sections):
+    with open(path, "w") as output:
+        for i in range(sections):
+            print(
+                f"[Node_{i:06d}]",
+                f'label = "Node {i}"',
+                f"weight = {i % 10}.0",
+                f"parent = ${{Node_{i // 2:06d}:label}}",
+                "",
+                sep="\n", file=output
+            )
+    return path
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in kilobytes."""
+    rv = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rv // 1024 if sys.platform == "darwin" else rv
+
+
+def load(mode, path):
+    if mode == "string":
+        return Config.from_string(path.read_text(), path=path)
+    elif mode == "stream":
+        return Config.from_path(path)
+
+
+def measure(mode, path):
+    rv = subprocess.run(
+        [sys.executable, "-m", "confusion.bench.memory", "--mode", mode, str(path)],
+        capture_output=True, text=True, check=True
+    )
+    return int(rv.stdout)
+
+
+def main(args):
+    if resource is None:
+        print("Peak RSS is not available on this platform.", file=sys.stderr)
+        return 2
+
+    if args.mode:
+        load(args.mode, args.input)
+        print(peak_rss())
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input or generate(pathlib.Path(tmp, "bench.cfn"), args.sections)
+        print("File size", path.stat().st_size // 1024, "kB", file=sys.stderr)
+        baseline = measure("none", path)
+        for mode in ("string", "stream"):
+            print(f"{mode:<8} peak RSS {measure(mode, path) - baseline:>10} kB", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--sections", type=int, default=100000,
+        help="Set the number of sections to generate."
+    )
+    rv.add_argument(
+        "--mode", choices=["none", "string", "stream"], default=None,
+        help=argparse.SUPPRESS
+    )
+    rv.add_argument(
+        "input", nargs="?", type=pathlib.Path, default=None,
+        help="Set input file. One is generated if not supplied."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
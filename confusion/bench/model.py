@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Compares the time taken to build a cfn2dot Model from a parser,
+either through text or directly from its tables.
+
+Usage:
+
+    python -m confusion.bench.model --nodes 50000
+
+"""
+
+import argparse
+import sys
+import time
+
+from confusion.bench.data import graph
+from confusion.parser import TOMLParser
+from confusion.utils.cfn2dot import Model
+
+
+def via_text(parser):
+    return Model(parser.write_string(), parser.tables)
+
+
+def via_parser(parser):
+    return Model.from_parser(parser)
+
+
+def measure(text, method):
+    """Return the seconds taken to build the nodes of a model from a freshly parsed text."""
+    parser = TOMLParser.from_string(text)
+    start = time.perf_counter()
+    method(parser).nodes
+    return time.perf_counter() - start
+
+
+def main(args):
+    text = graph(args.nodes)
+    for method in (via_text, via_parser):
+        print(f"{method.__name__:<12} {measure(text, method):>8.3f} s", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--nodes", type=int, default=50000,
+        help="Set the number of nodes to generate."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
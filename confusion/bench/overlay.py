@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Compares the memory held by tenant configurations, as full copies and as overlays.
+
+Usage:
+
+    python -m confusion.bench.overlay --sections 1000 --tenants 10
+
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from confusion.bench.data import config
+from confusion.config import Config
+from confusion.overlay import Overlay
+
+
+def overrides(n, sections):
+    """Return the options which tenant `n` sets for itself."""
+    i = n % sections or 1
+    i = i if i % 10 else i + 1
+    return {f"S{i}_int_0": n, f"S{i}_str_1": f"tenant {n}"}
+
+
+def measure(build, tenants):
+    """Return the bytes allocated per tenant, with their tables resolved."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rv = [build(n) for n in range(tenants)]
+        for tenant in rv:
+            dict(tenant.tables)
+        return (tracemalloc.get_traced_memory()[0] - before) / tenants
+    finally:
+        tracemalloc.stop()
+
+
+def main(args):
+    text = config(args.sections, args.keys)
+    base = Config.from_string(text)
+    dict(base.tables)
+
+    def copy(n):
+        return Config.from_string(text).merge(overrides(n, args.sections))
+
+    def overlay(n):
+        return Overlay(base).merge(overrides(n, args.sections))
+
+    print(f"Sections {args.sections}, tenants {args.tenants}", file=sys.stderr)
+    for name, build in (("copy", copy), ("overlay", overlay)):
+        print(f"{name:<8} {measure(build, args.tenants) / 1024:>10.1f} kB per tenant", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--sections", type=int, default=1000,
+        help="Set the number of sections in the base."
+    )
+    rv.add_argument(
+        "--keys", type=int, default=10,
+        help="Set the number of options in each section."
+    )
+    rv.add_argument(
+        "--tenants", type=int, default=10,
+        help="Set the number of tenants to build."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
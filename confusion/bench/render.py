@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Measures the rate at which cfn2dot renders a generated graph.
+
+Usage:
+
+    python -m confusion.bench.render --nodes 50000
+
+"""
+
+import argparse
+import sys
+import time
+
+from confusion.bench.data import graph
+from confusion.utils.cfn2dot import Model
+from confusion.utils.cfn2dot import parser as cli
+
+
+def measure(model, method, repeat=3):
+    """Return the best rate in lines per second over a number of runs."""
+    rv = 0
+    for n in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for line in getattr(model, method)())
+        rv = max(rv, count / (time.perf_counter() - start))
+    return rv
+
+
+def main(args):
+    model = Model.loads(graph(args.nodes))
+    model.args = cli().parse_args(["bench.cfn"])
+    print("Nodes", len(model.nodes), file=sys.stderr)
+    for method in ("to_dot", "to_cluster"):
+        print(f"{method:<12} {measure(model, method):>12.0f} lines/sec", file=sys.stdout)
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument(
+        "--nodes", type=int, default=50000,
+        help="Set the number of nodes to generate."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,207 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Runs benchmarks over the parse, interpolate and tables pipeline.
+
+Usage:
+
+    python -m confusion.bench.suite --output results.json
+
+    python -m confusion.bench.suite --baseline results.json --threshold 1.5
+
+Each case prepares fresh objects, then times one step. The best time over
+a number of repeats is reported, along with the peak memory allocated by
+the step in a separate run under tracemalloc. With a baseline, the exit status
+is 1 if any case is slower, or uses more memory, by more than the threshold.
+
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import time
+import tracemalloc
+
+from confusion.bench.data import config
+from confusion.bench.data import graph
+from confusion.config import Config
+from confusion.parser import TOMLParser
+from confusion.utils.cfn2dot import Model
+from confusion.utils.cfn2dot import parser as cli
+
+try:
+    from importlib.metadata import version
+    VERSION = version("confusion")
+except Exception:
+    VERSION = "unknown"
+
+
+class Suite:
+
+    def __init__(self, sections=1000, keys=10, depth=4, fanout=4, nodes=10000):
+        self.params = dict(sections=sections, keys=keys, depth=depth, fanout=fanout, nodes=nodes)
+        self.text = config(sections, keys, depth, fanout)
+        self.graph = graph(nodes)
+
+    def case_parse(self):
+        return lambda: TOMLParser.from_string(self.text)
+
+    def case_literals(self):
+        parser = TOMLParser.from_string(self.text)
+        return lambda: {k: dict(v) for k, v in parser.literals.items()}
+
+    def case_tables(self):
+        parser = TOMLParser.from_string(self.text)
+        return lambda: dict(parser.tables)
+
+    def case_write_string(self):
+        parser = TOMLParser.from_string(self.text)
+        return parser.write_string
+
+    def case_merge(self):
+        conf = Config.from_string(self.text)
+        dict(conf.tables)
+        env = {f"S{i}_int_0": i for i in range(1, self.params["sections"], 10)}
+        env.update({f"NOT_{i}": i for i in range(len(env))})
+        return lambda: conf.merge(env)
+
+    def case_to_dot(self):
+        model = Model.loads(self.graph)
+        model.args = cli().parse_args(["bench.cfn"])
+        model.nodes
+        return lambda: sum(1 for line in model.to_dot())
+
+    @property
+    def cases(self):
+        return {k[5:]: getattr(self, k) for k in dir(self) if k.startswith("case_")}
+
+    @staticmethod
+    def measure(setup, repeat=3):
+        """Return the best time and the peak memory in kilobytes of a step."""
+        seconds = None
+        for n in range(repeat):
+            step = setup()
+            start = time.perf_counter()
+            step()
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+        step = setup()
+        tracemalloc.start()
+        try:
+            step()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {"seconds": seconds, "peak_kb": peak // 1024}
+
+    def run(self, names=None, repeat=3):
+        return {
+            "meta": {
+                "version": VERSION,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "params": self.params,
+                "repeat": repeat,
+            },
+            "results": {
+                name: self.measure(setup, repeat=repeat)
+                for name, setup in self.cases.items()
+                if not names or name in names
+            },
+        }
+
+    @staticmethod
+    def compare(results, baseline, threshold=1.5):
+        """Return a list of the cases whose measures exceed the baseline by more than the threshold."""
+        rv = []
+        for name, current in results["results"].items():
+            previous = baseline["results"].get(name)
+            if previous is None:
+                continue
+            for measure, value in current.items():
+                if previous.get(measure) and value > previous[measure] * threshold:
+                    rv.append((name, measure, previous[measure], value))
+        return rv
+
+
+def main(args):
+    suite = Suite(
+        sections=args.sections, keys=args.keys, depth=args.depth, fanout=args.fanout, nodes=args.nodes
+    )
+    results = suite.run(names=args.case, repeat=args.repeat)
+    for name, result in results["results"].items():
+        print(f"{name:<14} {result['seconds']:>10.4f} s {result['peak_kb']:>10} kB", file=sys.stdout)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"]["params"] != results["meta"]["params"]:
+            print("Baseline was run with different parameters.", file=sys.stderr)
+            return 2
+
+        regressions = suite.compare(results, baseline, threshold=args.threshold)
+        for name, measure, previous, value in regressions:
+            print(f"Regression in {name}: {measure} {previous:g} -> {value:g}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def parser():
+    rv = argparse.ArgumentParser(__doc__)
+    rv.add_argument("--sections", type=int, default=1000, help="Set the number of sections.")
+    rv.add_argument("--keys", type=int, default=10, help="Set the number of options in each section.")
+    rv.add_argument("--depth", type=int, default=4, help="Set the length of reference chains.")
+    rv.add_argument("--fanout", type=int, default=4, help="Set the number of options in DEFAULT.")
+    rv.add_argument("--nodes", type=int, default=10000, help="Set the number of nodes in the graph.")
+    rv.add_argument("--repeat", type=int, default=5, help="Set the number of timed runs of each case.")
+    rv.add_argument(
+        "--case", action="append", default=None,
+        help="Run only the named case. May be given more than once."
+    )
+    rv.add_argument(
+        "--output", type=pathlib.Path, default=None,
+        help="Write results as JSON to a file."
+    )
+    rv.add_argument(
+        "--baseline", type=pathlib.Path, default=None,
+        help="Compare results with those in a JSON file."
+    )
+    rv.add_argument(
+        "--threshold", type=float, default=1.5,
+        help="Set the ratio to the baseline above which a result is a regression."
+    )
+    return rv
+
+
+def run():
+    p = parser()
+    args = p.parse_args()
+    rv = main(args)
+    sys.exit(rv)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,187 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+An on-disk cache of fully resolved configurations.
+
+Entries are named by a hash of the source text, the library version and
+the options of the parser. Each file holds a header followed by a payload
+in marshal format. The header is checked before the payload is loaded.
+
+"""
+
+import contextlib
+import datetime
+import hashlib
+import marshal
+import mmap
+import os
+import pathlib
+import sys
+import tempfile
+
+from confusion.graph import Graph
+
+try:
+    from importlib.metadata import version
+    VERSION = version("confusion")
+except Exception:
+    VERSION = "unknown"
+
+
+class Cache:
+
+    magic = b"CFNC\x01"
+    suffix = ".cfc"
+    types = {"datetime": datetime.datetime, "date": datetime.date, "time": datetime.time}
+
+    @staticmethod
+    def encode(obj):
+        if isinstance(obj, dict):
+            return {k: Cache.encode(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [Cache.encode(i) for i in obj]
+        elif isinstance(obj, datetime.datetime):
+            return ("datetime", obj.isoformat())
+        elif isinstance(obj, datetime.date):
+            return ("date", obj.isoformat())
+        elif isinstance(obj, datetime.time):
+            return ("time", obj.isoformat())
+        return obj
+
+    @staticmethod
+    def decode(obj):
+        if isinstance(obj, dict):
+            return {k: Cache.decode(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [Cache.decode(i) for i in obj]
+        elif isinstance(obj, tuple):
+            kind, text = obj
+            return Cache.types[kind].fromisoformat(text)
+        return obj
+
+    @staticmethod
+    def temporal(obj):
+        if isinstance(obj, dict):
+            return any(Cache.temporal(i) for i in obj.values())
+        elif isinstance(obj, list):
+            return any(Cache.temporal(i) for i in obj)
+        return isinstance(obj, (datetime.date, datetime.time))
+
+    @staticmethod
+    @contextlib.contextmanager
+    def view(path):
+        """
+        Map the contents of a file into memory rather than read them.
+
+        """
+        with open(path, "rb") as fp:
+            if not os.fstat(fp.fileno()).st_size:
+                yield b""
+                return
+
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as rv:
+                yield rv
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+
+    def key(self, text, cls, options):
+        """
+        Return a digest for the source, or None if the options cannot be cached.
+
+        The source may be text or a bytes-like object.
+
+        """
+        if not all(isinstance(v, (str, int, float, bool, type(None))) for v in options.values()):
+            return None
+
+        rv = hashlib.sha256()
+        for i in (
+            VERSION, sys.version, f"{cls.__module__}.{cls.__qualname__}",
+            repr(sorted(options.items()))
+        ):
+            rv.update(i.encode("utf-8", "surrogatepass"))
+            rv.update(b"\x00")
+        rv.update(text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text)
+        return rv.digest()
+
+    def load(self, key):
+        try:
+            data = (self.path / (key.hex() + self.suffix)).read_bytes()
+        except OSError:
+            return None
+
+        n = len(self.magic)
+        header, digest, check, payload = data[:n], data[n:n + 32], data[n + 32:n + 64], data[n + 64:]
+        if header != self.magic or digest != key or hashlib.sha256(payload).digest() != check:
+            return None
+
+        try:
+            return marshal.loads(payload)
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def save(self, key, data):
+        payload = marshal.dumps(data)
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as output:
+                output.write(self.magic + key + hashlib.sha256(payload).digest() + payload)
+            os.replace(name, self.path / (key.hex() + self.suffix))
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def dump(parser):
+        """
+        Resolve every value of a parser and return the result in a marshallable form.
+
+        """
+        tables = dict(parser.tables)
+        for literal in parser.literals.values():
+            dict(literal)
+        graph = parser.graph
+        return {
+            "defaults": dict(parser._defaults),
+            "sections": [[k, dict(v)] for k, v in parser._sections.items()],
+            "contextual": list(graph.contextual),
+            "deps": [[s, o, [list(i) for i in v]] for (s, o), v in graph.deps.items()],
+            "values": [[s, o, v] for (s, o), v in graph.values.items()],
+            "tables": {k: Cache.encode(v) for k, v in tables.items()},
+            "temporal": [k for k, v in tables.items() if Cache.temporal(v)],
+        }
+
+    @staticmethod
+    def restore(parser, data):
+        parser.read_raw(data["defaults"], dict(data["sections"]))
+
+        graph = parser._graph = Graph(parser)
+        if graph.compiled:
+            graph.adopt(data["contextual"], {(s, o): tuple(map(tuple, v)) for s, o, v in data["deps"]})
+        graph.values.update({(s, o): v for s, o, v in data["values"]})
+
+        tables = data["tables"]
+        for k in data["temporal"]:
+            tables[k] = Cache.decode(tables[k])
+        parser.tables.resolved.update({(k,): v for k, v in tables.items()})
+        return parser
@@ -18,43 +18,186 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 # USA
 
+import asyncio
+import configparser
+import contextlib
+import functools
+import io
 import logging
+import os
 import pathlib
+import threading
 
+from confusion.cache import Cache
 from confusion.parser import tomllib
 from confusion.parser import TOMLParser
+from confusion.snapshot import Snapshot
+from confusion.tables import TableBuilder
 
 
 class Config(TOMLParser):
 
+    # Loads in progress, by event loop and arguments
+    loading = {}
+
+    @classmethod
+    def load(cls, path: pathlib.Path, cache: pathlib.Path=None, **kwargs):
+        """
+        Read a file and resolve all its tables.
+
+        """
+        rv = cls.from_path(path, cache=cache, **kwargs)
+        dict(rv.tables)
+        return rv
+
+    @classmethod
+    async def aload(cls, path: pathlib.Path, cache: pathlib.Path=None, executor=None, **kwargs):
+        """
+        Load a file in an executor, so as not to block the event loop.
+
+        Concurrent calls with the same arguments share a single load, and its result.
+
+        """
+        loop = asyncio.get_running_loop()
+        key = (
+            loop, cls, os.fspath(path), cache and os.fspath(cache),
+            tuple(sorted((k, v if isinstance(v, (str, int, float, bool)) else id(v)) for k, v in kwargs.items()))
+        )
+        try:
+            future = cls.loading[key]
+        except KeyError:
+            future = cls.loading[key] = loop.run_in_executor(
+                executor, functools.partial(cls.load, path, cache=cache, **kwargs)
+            )
+            future.add_done_callback(lambda f: cls.loading.pop(key, None))
+        # One caller which is cancelled must not cancel the load for the others
+        return await asyncio.shield(future)
+
     @classmethod
-    def from_path(cls, path: pathlib.Path, **kwargs):
-        text = path.read_text()
-        return cls.from_string(text, path=path, **kwargs)
+    def from_path(cls, path: pathlib.Path, cache: pathlib.Path=None, **kwargs):
+        if cache is None:
+            return cls.from_file(path, path=path, **kwargs)
+
+        stats = kwargs.get("stats")
+        store = Cache(cache)
+        with Cache.view(path) as data:
+            key = store.key(data, cls, {k: v for k, v in kwargs.items() if k != "stats"})
+            if key is None:
+                return cls.from_file(path, path=path, **kwargs)
+
+            encoding = kwargs.pop("encoding", None)
+            entry = store.load(key)
+            if entry is not None:
+                try:
+                    rv = store.restore(cls(path=path, **kwargs), entry)
+                except (KeyError, TypeError, ValueError):
+                    pass
+                else:
+                    if stats is not None:
+                        stats.hit("cache")
+                    return rv
+
+            if stats is not None:
+                stats.miss("cache")
+
+            # Parse the bytes which were hashed, lest the file be replaced in the meantime
+            rv = cls(path=path, **kwargs)
+            with io.TextIOWrapper(io.BytesIO(data), encoding=encoding) as fp:
+                rv.read_file(fp, source=str(path))
+
+        try:
+            entry = store.dump(rv)
+        except (configparser.Error, tomllib.TOMLDecodeError):
+            return rv
+
+        store.save(key, entry)
+        return rv
 
     def __init__(self, path: pathlib.Path=None, **kwargs):
         super().__init__(**kwargs)
         self.path = path
+        self.lock = threading.RLock()
+        self._snapshot = None
+
+    @property
+    def current(self):
+        """
+        The most recent snapshot, which is safe to read from any thread without locking.
+
+        """
+        rv = self._snapshot
+        return rv if rv is not None else self.snapshot()
+
+    def snapshot(self):
+        """
+        Resolve every table into a frozen Snapshot and publish it as `current`.
+
+        Readers holding the previous snapshot are unaffected.
+
+        """
+        with self.lock:
+            if self.stats is None:
+                rv = Snapshot.from_parser(self)
+            else:
+                with self.stats.timer("snapshot"):
+                    rv = Snapshot.from_parser(self)
+            self._snapshot = rv
+        return rv
+
+    @staticmethod
+    def encode(key, val):
+        """
+        Return `val` as it should be stored; quoted unless it is already valid TOML.
+
+        """
+        text = str(val)
+        if TableBuilder.bare_key.fullmatch(key):
+            if TableBuilder.literal.fullmatch(text):
+                return text
+
+            start = text.lstrip(" \t")[:1]
+            if not start or start not in "0123456789+-\"'[{tfin":
+                return f'"{text}"'
+
+        try:
+            tomllib.loads(f"{key} = {val}")
+            return text
+        except Exception:
+            return f'"{val}"'
 
     def merge(self, data, sep="_"):
-        items = [
-            (section, key, val)
-            for val, section, _ , key in [
-                (v, *k.partition(sep))
-                for k, v in data.items()
-            ]
-            if key and section in self.sections
-        ]
+        items = []
+        for k, v in data.items():
+            section, _, key = k.partition(sep)
+            if key and section in self._sections:
+                items.append((section, key, self.encode(key, v)))
 
         for s, k, v in items:
-            try:
-                tomllib.loads(f"{k} = {v}")
-                self[s][k] = str(v)
-            except Exception:
-                self[s][k] = f'"{v}"'
+            self._interpolation.before_set(self, s, k, v)
+
+        timer = contextlib.nullcontext() if self.stats is None else self.stats.timer("merge")
+        with self.lock:
+            with timer, self.batch():
+                for s, k, v in items:
+                    self.set(s, k, v)
+
+            if self._snapshot is not None:
+                self.snapshot()
 
         return self
 
+    async def atables(self, executor=None):
+        """
+        Resolve every table in an executor, and return them as a dictionary.
+
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.resolve)
+
+    def resolve(self):
+        with self.lock:
+            return dict(self.tables)
+
     def configure_logging(self, table_name="logging"):
         logging.config.dictConfig(self.tables.get(table_name, {"version": 1}))
         return self
@@ -0,0 +1,440 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Compiles the `${section:option}` references of a parser into a dependency graph.
+
+Every value is resolved at most once, after the values it refers to.
+The syntax is that of configparser.ExtendedInterpolation, without its
+limit on the depth of references. Cycles are detected when the graph
+is compiled.
+
+"""
+
+import collections
+from collections.abc import Mapping
+import configparser
+import functools
+import itertools
+
+
+class InterpolationCycleError(configparser.InterpolationDepthError):
+
+    def __init__(self, option, section, path):
+        configparser.InterpolationError.__init__(
+            self, option, section,
+            "Interpolation cycle: {0}".format(" -> ".join(":".join(i) for i in path))
+        )
+        self.path = path
+        self.args = (option, section, path)
+
+
+class Fault(str):
+    pass
+
+
+class Literal(Mapping):
+    """
+    The interpolated values of a section, layered over those of DEFAULT.
+
+    Values are resolved when read, and memoised once in the graph rather
+    than copied into every section.
+
+    """
+
+    __slots__ = ("graph", "section", "own", "defaults")
+
+    def __init__(self, graph, section):
+        self.graph = graph
+        self.section = section
+        self.own = graph.parser._sections[section]
+        self.defaults = graph.parser._defaults
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __getitem__(self, option):
+        if option in self.own or option in self.defaults:
+            return self.graph.value(self.section, option)
+        raise KeyError(option)
+
+    def __iter__(self):
+        defaults = self.defaults
+        return itertools.chain(defaults, (i for i in self.own if i not in defaults))
+
+    def __len__(self):
+        defaults = self.defaults
+        return len(defaults) + sum(1 for i in self.own if i not in defaults)
+
+
+class Graph:
+
+    reference = configparser.ExtendedInterpolation._KEYCRE
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def template(text):
+        """
+        Split a raw value into literal text, references and syntax faults.
+
+        Returns None when the value holds no interpolation syntax.
+
+        """
+        if text is None or "$" not in text:
+            return None
+
+        rv = []
+        rest = text
+        while rest:
+            p = rest.find("$")
+            if p < 0:
+                rv.append(rest)
+                break
+            if p > 0:
+                rv.append(rest[:p])
+                rest = rest[p:]
+
+            c = rest[1:2]
+            if c == "$":
+                rv.append("$")
+                rest = rest[2:]
+            elif c == "{":
+                m = Graph.reference.match(rest)
+                if m is None:
+                    rv.append(Fault("bad interpolation variable reference %r" % rest))
+                    break
+                path = m.group(1).split(":")
+                rest = rest[m.end():]
+                if len(path) == 1:
+                    rv.append((None, path[0], m.group(1)))
+                elif len(path) == 2:
+                    rv.append((path[0], path[1], m.group(1)))
+                else:
+                    rv.append(Fault("More than one ':' found: %r" % (rest,)))
+                    break
+            else:
+                rv.append(Fault("'$' must be followed by '$' or '{', found: %r" % (rest,)))
+                break
+        return tuple(rv)
+
+    @staticmethod
+    def is_local(template):
+        return any(isinstance(i, tuple) and i[0] is None for i in template or ())
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.stats = getattr(parser, "stats", None)
+        self.default = parser.default_section
+        self.compiled = type(parser._interpolation) is configparser.ExtendedInterpolation
+        self.contextual = set()
+        self.inherited = set()
+        self.deps = {}
+        self.dependents = collections.defaultdict(set)
+        self.values = {}
+
+    def compile(self):
+        if not self.compiled:
+            return self
+
+        if self.stats is not None:
+            with self.stats.timer("compile"):
+                return self._compile()
+        return self._compile()
+
+    def _compile(self):
+
+        defaults = self.parser._defaults
+        self.inherited = set(defaults)
+        self.contextual = {k for k, v in defaults.items() if self.is_local(self.template(v))}
+        for option in defaults:
+            self.link((self.default, option))
+
+        for section, own in self.parser._sections.items():
+            for option in itertools.chain(own, (i for i in self.contextual if i not in own)):
+                self.link((section, option))
+
+        self.check([i for i in self.deps if self.checked(i)])
+        return self
+
+    def adopt(self, contextual, deps):
+        """
+        Take on the edges of a previously compiled graph.
+
+        """
+        self.inherited = set(self.parser._defaults)
+        self.contextual = set(contextual)
+        self.deps = deps
+        for key, edges in deps.items():
+            for dep in edges:
+                self.dependents[dep].add(key)
+                if self.shared(dep):
+                    self.dependents[(self.default, dep[1])].add(dep)
+        return self
+
+    def update(self, keys):
+        """
+        Relink the nodes for options which have been set or removed, or for
+        sections which have been added or removed when the option is None.
+
+        Returns the names of the sections whose values have been discarded,
+        or None if the graph must be compiled again.
+
+        """
+        if not self.compiled:
+            return None
+
+        defaults = self.parser._defaults
+        sections = self.parser._sections
+        seeds = set()
+        changed = set()
+        for section, option in keys:
+            if option is None:
+                if section == self.default:
+                    return None
+                changed.add(section)
+                continue
+
+            key = self.key(section, option)
+            option = key[1]
+            if section == self.default:
+                if (option in defaults) != (option in self.inherited):
+                    return None
+                if self.is_local(self.template(defaults[option])) != (option in self.contextual):
+                    return None
+                if option in self.contextual:
+                    seeds.update((i, option) for i, own in sections.items() if option not in own)
+            elif section not in sections:
+                return None
+            seeds.add(key)
+
+        if changed:
+            # Sections added or removed; relink their nodes and any references to them
+            seeds.update(
+                i for i in itertools.chain(self.deps, self.dependents, self.values)
+                if i[0] in changed
+            )
+            seeds.update((s, i) for s in changed if s in sections for i in self.contextual)
+
+        for key in seeds:
+            self.link(key)
+
+        try:
+            self.check([i for i in seeds if self.checked(i)])
+        except InterpolationCycleError:
+            return None
+
+        dirty = set(seeds)
+        stack = list(seeds)
+        while stack:
+            for node in self.dependents.get(stack.pop(), ()):
+                if node not in dirty:
+                    dirty.add(node)
+                    stack.append(node)
+
+        rv = changed
+        for section, option in dirty:
+            self.values.pop((section, option), None)
+            if section == self.default:
+                rv.update(i for i, own in sections.items() if option not in own)
+            else:
+                rv.add(section)
+        return rv
+
+    def key(self, section, option):
+        return (section, self.parser.optionxform(option))
+
+    def shared(self, key):
+        """
+        True if the node takes its value unaltered from the DEFAULT section.
+
+        """
+        section, option = key
+        if section == self.default:
+            return False
+
+        own = self.parser._sections.get(section)
+        return own is not None and option not in own and option not in self.contextual
+
+    def checked(self, key):
+        """
+        True if the node is checked for cycles when compiled. A reference in DEFAULT
+        to an option of the same section is only resolved in the sections which use it.
+
+        """
+        return key[0] != self.default or key[1] not in self.contextual
+
+    def edges(self, key):
+        try:
+            return self.deps[key]
+        except KeyError:
+            return ((self.default, key[1]),) if self.shared(key) else ()
+
+    def link(self, key):
+        for dep in self.deps.pop(key, ()):
+            self.dependents[dep].discard(key)
+
+        if self.shared(key):
+            self.dependents[(self.default, key[1])].add(key)
+            return
+
+        try:
+            template = self.template(self.raw(key))
+        except KeyError:
+            return
+
+        if template:
+            deps = self.deps[key] = tuple(
+                self.key(i[0] or key[0], i[1])
+                for i in template if isinstance(i, tuple)
+            )
+            for dep in deps:
+                self.dependents[dep].add(key)
+                if self.shared(dep):
+                    self.dependents[(self.default, dep[1])].add(dep)
+
+    def check(self, nodes):
+        done = set()
+        for node in nodes:
+            if node in done:
+                continue
+
+            path = [node]
+            active = {node}
+            stack = [iter(self.edges(node))]
+            while stack:
+                for dep in stack[-1]:
+                    if dep in active:
+                        cycle = path[path.index(dep):] + [dep]
+                        raise InterpolationCycleError(dep[1], dep[0], cycle)
+                    if dep not in done:
+                        path.append(dep)
+                        active.add(dep)
+                        stack.append(iter(self.edges(dep)))
+                        break
+                else:
+                    stack.pop()
+                    node = path.pop()
+                    active.discard(node)
+                    done.add(node)
+
+    def exists(self, key):
+        try:
+            self.raw(key)
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def raw(self, key):
+        section, option = key
+        if section == self.default:
+            return self.parser._defaults[option]
+
+        own = self.parser._sections[section]
+        try:
+            return own[option]
+        except KeyError:
+            return self.parser._defaults[option]
+
+    def value(self, section, option):
+        if not self.compiled:
+            key = (section, option)
+            try:
+                return self.values[key]
+            except KeyError:
+                rv = self.values[key] = self.parser.get(section, option)
+                return rv
+
+        key = self.key(section, option)
+        if self.shared(key):
+            key = (self.default, key[1])
+
+        try:
+            rv = self.values[key]
+        except KeyError:
+            if self.stats is not None:
+                self.stats.miss("values")
+        else:
+            if self.stats is not None:
+                self.stats.hit("values")
+            return rv
+
+        if not self.exists(key):
+            # Let the parser raise its customary exception
+            self.parser.get(section, option, raw=True)
+
+        if not self.checked(key):
+            self.check([key])
+
+        if self.edges(key):
+            for node in self.order(key):
+                self.values[node] = self.evaluate(node)
+            return self.values[key]
+
+        rv = self.values[key] = self.evaluate(key)
+        return rv
+
+    def order(self, key):
+        rv = []
+        seen = {key}
+        stack = [(key, iter(self.edges(key)))]
+        while stack:
+            node, deps = stack[-1]
+            for dep in deps:
+                if dep not in seen and dep not in self.values and self.exists(dep):
+                    seen.add(dep)
+                    stack.append((dep, iter(self.edges(dep))))
+                    break
+            else:
+                stack.pop()
+                rv.append(node)
+        return rv
+
+    def evaluate(self, key):
+        section, option = key
+        if self.shared(key):
+            return self.values[(self.default, option)]
+
+        text = self.raw(key)
+        template = self.template(text)
+        if template is None:
+            return text
+
+        if self.stats is not None:
+            self.stats.count("interpolations")
+
+        rv = []
+        for part in template:
+            if isinstance(part, Fault):
+                raise configparser.InterpolationSyntaxError(option, section, str(part))
+            elif isinstance(part, tuple):
+                dep = self.key(part[0] or section, part[1])
+                try:
+                    rv.append(self.values[dep])
+                except KeyError:
+                    raise configparser.InterpolationMissingOptionError(
+                        option, section, text, part[2]
+                    ) from None
+            else:
+                rv.append(part)
+        return "".join(rv)
+
+    def literal(self, section):
+        return Literal(self, section)
@@ -0,0 +1,154 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+A single pass reader of CFN text into the raw store of a parser.
+
+It follows the rules of configparser's own reader line for line, and so
+leaves the same sections and options behind, but tests each line with
+string methods rather than a series of regular expressions. Multiline
+values, such as TOML triple-quoted strings, continue on lines indented
+deeper than their first, as they do for configparser.
+
+Only the default delimiters are supported, without inline comments.
+Parsers with other options, or on versions of Python whose configparser
+lacks the internals used here, are read by configparser.
+
+"""
+
+import configparser
+import sys
+
+
+class Lexer:
+
+    @staticmethod
+    def supports(parser):
+        # These private attributes of configparser are not there in every version of Python
+        if not all(
+            hasattr(parser, i)
+            for i in ("_optcre", "_comment_prefixes", "_inline_comment_prefixes", "_handle_error")
+        ):
+            return False
+
+        return (
+            parser._optcre is parser.OPTCRE
+            and not parser._inline_comment_prefixes
+            and parser.SECTCRE.pattern.startswith("\\[")
+        )
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def read(self, fp, fpname):
+        parser = self.parser
+        sections = parser._sections
+        proxies = parser._proxies
+        defaults = parser._defaults
+        default_section = parser.default_section
+        optionxform = parser.optionxform
+        header = parser.SECTCRE.match
+        comments = tuple(parser._comment_prefixes)
+        empty_lines = parser._empty_lines_in_values
+        strict = parser._strict
+
+        added = set()
+        touched = {}
+        cursect = None
+        sectname = None
+        optname = None
+        indent_level = 0
+        e = None
+        for lineno, line in enumerate(fp, start=1):
+            value = line.strip()
+            if not value:
+                if empty_lines:
+                    if cursect is not None and optname and cursect[optname] is not None:
+                        cursect[optname].append("")
+                else:
+                    indent_level = sys.maxsize
+                continue
+
+            if comments and value.startswith(comments):
+                if not empty_lines:
+                    indent_level = sys.maxsize
+                continue
+
+            indent = len(line) - len(line.lstrip())
+            if cursect is not None and optname and indent > indent_level:
+                cursect[optname].append(value)
+                continue
+
+            indent_level = indent
+            mo = header(value) if value[0] == "[" else None
+            if mo:
+                sectname = mo.group("header")
+                if sectname in sections:
+                    if strict and sectname in added:
+                        raise configparser.DuplicateSectionError(sectname, fpname, lineno)
+                    cursect = sections[sectname]
+                    added.add(sectname)
+                elif sectname == default_section:
+                    cursect = defaults
+                else:
+                    cursect = parser._dict()
+                    sections[sectname] = cursect
+                    proxies[sectname] = configparser.SectionProxy(parser, sectname)
+                    added.add(sectname)
+                touched[sectname] = cursect
+                optname = None
+                continue
+
+            if cursect is None:
+                raise configparser.MissingSectionHeaderError(fpname, lineno, line)
+
+            i = value.find("=")
+            j = value.find(":", 0, i if i >= 0 else len(value))
+            if j >= 0:
+                i = j
+            if i < 0:
+                e = parser._handle_error(e, fpname, lineno, line)
+                continue
+
+            optname = value[:i].rstrip()
+            if not optname:
+                e = parser._handle_error(e, fpname, lineno, line)
+            optname = optionxform(optname)
+            if strict and (sectname, optname) in added:
+                raise configparser.DuplicateOptionError(sectname, optname, fpname, lineno)
+            added.add((sectname, optname))
+            cursect[optname] = [value[i + 1:].lstrip()]
+
+        self.join(touched)
+        if e:
+            raise e
+
+    def join(self, touched):
+        """
+        Join the lines of multiline values in those sections which were read.
+
+        """
+        parser = self.parser
+        before_read = parser._interpolation.before_read
+        for section, options in touched.items():
+            for name, val in options.items():
+                if isinstance(val, list):
+                    val = "\n".join(val).rstrip()
+                    options[name] = before_read(parser, section, name, val)
@@ -0,0 +1,374 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Configurations which override a shared base, and store only their differences.
+
+A base Config is read once. Each Overlay refers to it, and keeps its own
+options, sections, resolved values and tables only where they differ::
+
+    base = Config.from_path("base.cfn")
+    tenant = Overlay.from_path("tenant.cfn", base=base)
+    tenant.merge(os.environ)
+
+An overlay copies a table of the base when first read, so that changes to it
+stay with that overlay. When the base is modified, each overlay derives its
+graph and tables anew on next access.
+
+"""
+
+import collections
+from collections.abc import Mapping
+from collections.abc import MutableMapping
+import configparser
+
+from confusion.config import Config
+from confusion.graph import Graph
+from confusion.tables import Tables
+
+
+class Options(MutableMapping):
+    """
+    The options of one section of an overlay, over those of the base.
+
+    Writes go to the overlay. Removing an option of the base leaves a tombstone.
+
+    """
+
+    __slots__ = ("layer", "name", "base")
+
+    def __init__(self, layer, name, base):
+        self.layer = layer
+        self.name = name
+        self.base = base
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __contains__(self, option):
+        own = self.layer.own.get(self.name)
+        if own is not None and option in own:
+            return True
+        return self.base is not None and option in self.base and (self.name, option) not in self.layer.removed
+
+    def __getitem__(self, option):
+        own = self.layer.own.get(self.name)
+        if own is not None and option in own:
+            return own[option]
+        if self.base is not None and (self.name, option) not in self.layer.removed:
+            return self.base[option]
+        raise KeyError(option)
+
+    def __setitem__(self, option, value):
+        own = self.layer.own.get(self.name)
+        if own is None or option not in own:
+            base = self.base
+            if base is not None and base.get(option) is value and (self.name, option) not in self.layer.removed:
+                # Writing back a value of the base changes nothing
+                return
+        if own is None:
+            own = self.layer.own[self.name] = {}
+        own[option] = value
+
+    def __delitem__(self, option):
+        own = self.layer.own.get(self.name)
+        rv = own is not None and own.pop(option, self) is not self
+        if self.base is not None and option in self.base and (self.name, option) not in self.layer.removed:
+            self.layer.removed.add((self.name, option))
+            rv = True
+        if not rv:
+            raise KeyError(option)
+
+    def __iter__(self):
+        own = self.layer.own.get(self.name, {})
+        base = self.base or {}
+        removed = self.layer.removed
+        name = self.name
+        yield from (k for k in base if (name, k) not in removed)
+        yield from (k for k in own if k not in base or (name, k) in removed)
+
+    def __len__(self):
+        return sum(1 for i in self)
+
+    def copy(self):
+        return dict(self)
+
+
+class Layer(MutableMapping):
+    """
+    The sections of an overlay, over those of the base.
+
+    """
+
+    def __init__(self, base, defaults, default_section):
+        self.base = base
+        self.defaults = defaults
+        self.default_section = default_section
+        self.own = {}
+        self.removed = set()
+        self.dropped = set()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+    def options(self, name):
+        if name == self.default_section:
+            return Options(self, name, self.defaults)
+        base = self.base.get(name) if name not in self.dropped else None
+        return Options(self, name, base)
+
+    def changes(self):
+        """
+        Return (section, option) pairs for every difference from the base.
+
+        The option is None for a section which has been added or removed.
+
+        """
+        rv = [(name, None) for name in self.dropped]
+        rv.extend((name, None) for name in self.own if name not in self.base and name in self)
+        for name, own in self.own.items():
+            if name == self.default_section or name in self:
+                rv.extend((name, option) for option in own)
+        rv.extend(i for i in self.removed if i[0] == self.default_section or i[0] in self)
+        return rv
+
+    def __contains__(self, name):
+        if name == self.default_section:
+            return False
+        if name in self.own:
+            return True
+        return name in self.base and name not in self.dropped
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self.options(name)
+
+    def __setitem__(self, name, options):
+        if name in self.base:
+            self.dropped.add(name)
+        self.own[name] = options
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.own.pop(name, None)
+        self.removed.difference_update({i for i in self.removed if i[0] == name})
+        if name in self.base:
+            self.dropped.add(name)
+
+    def __iter__(self):
+        yield from (k for k in self.base if k not in self.dropped)
+        yield from (k for k in self.own if k != self.default_section and (k not in self.base or k in self.dropped))
+
+    def __len__(self):
+        return sum(1 for i in self)
+
+
+class Proxies(MutableMapping):
+    """
+    The section proxies of an overlay, made on demand rather than one for each section of the base.
+
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __contains__(self, name):
+        return name == self.parser.default_section or name in self.parser._sections
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return configparser.SectionProxy(self.parser, name)
+
+    def __setitem__(self, name, proxy):
+        pass
+
+    def __delitem__(self, name):
+        pass
+
+    def __iter__(self):
+        yield self.parser.default_section
+        yield from self.parser._sections
+
+    def __len__(self):
+        return len(self.parser._sections) + 1
+
+
+class Values(Mapping):
+    """
+    The resolved values of an overlay, over those of the base.
+
+    Values of the base are hidden once an overlay has discarded them.
+
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.own = {}
+        self.hidden = set()
+
+    def __contains__(self, key):
+        return key in self.own or (key not in self.hidden and key in self.base)
+
+    def __getitem__(self, key):
+        try:
+            return self.own[key]
+        except KeyError:
+            if key in self.hidden:
+                raise
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.own[key] = value
+
+    def pop(self, key, *args):
+        self.hidden.add(key)
+        return self.own.pop(key, *args)
+
+    def __iter__(self):
+        yield from self.own
+        yield from (k for k in self.base if k not in self.hidden and k not in self.own)
+
+    def __len__(self):
+        return sum(1 for i in self)
+
+
+class Dependents(collections.defaultdict):
+    """
+    The edges of an overlay graph, added to those of the base.
+
+    """
+
+    def __init__(self, base):
+        super().__init__(set)
+        self.base = base
+
+    def __iter__(self):
+        yield from super().__iter__()
+        yield from (k for k in self.base if not dict.__contains__(self, k))
+
+    def get(self, key, default=None):
+        own = super().get(key)
+        base = self.base.get(key)
+        if own is None:
+            return default if base is None else base
+        return own | base if base else own
+
+
+class OverlayGraph(Graph):
+    """
+    A graph which relinks and resolves only those nodes affected by an overlay.
+
+    Any other value is resolved by the graph of the base, and shared.
+
+    """
+
+    def __init__(self, parser, base):
+        super().__init__(parser)
+        self.base = base
+        self.contextual = set(base.contextual)
+        self.inherited = set(base.inherited)
+        self.dependents = Dependents(base.dependents)
+        self.values = Values(base.values)
+        self.linked = set()
+        self.touched = set()
+
+    def compile(self):
+        """
+        Apply the differences of the overlay. Returns None if they change the
+        structure of the base too much to share it.
+
+        """
+        if not self.compiled or self.update(self.parser._sections.changes()) is None:
+            return None
+        return self
+
+    def update(self, keys):
+        rv = super().update(keys)
+        if rv is not None:
+            self.touched.update(rv)
+        return rv
+
+    def link(self, key):
+        self.linked.add(key)
+        super().link(key)
+
+    def edges(self, key):
+        if key in self.linked or (key[0] != self.default and key[0] not in self.base.parser._sections):
+            # Nodes of sections new to the overlay take their edges from it alone
+            return super().edges(key)
+        return self.base.edges(key)
+
+    def value(self, section, option):
+        key = self.key(section, option)
+        if self.shared(key):
+            key = (self.default, key[1])
+
+        if key in self.values.hidden or not self.exists(key):
+            return super().value(section, option)
+        return self.base.value(*key)
+
+
+class Overlay(Config):
+
+    def __init__(self, base: Config, path=None, **kwargs):
+        kwargs.setdefault("default_section", base.default_section)
+        super().__init__(path=path, **kwargs)
+        self.base = base
+        self.based = base.generation
+        own = self._defaults
+        self._sections = Layer(base._sections, base._defaults, self.default_section)
+        self._defaults = self._sections.options(self.default_section)
+        self._defaults.update(own)
+        self._proxies = Proxies(self)
+
+    def rebase(self):
+        """
+        Discard what was derived from the base if the base has changed since.
+
+        """
+        if self.based != self.base.generation:
+            self.based = self.base.generation
+            self.generation += 1
+            self._graph = None
+            self._tables = None
+
+    @property
+    def graph(self):
+        self.rebase()
+        if self._graph is None:
+            graph = None
+            if self.base.graph.compiled and self.optionxform is self.base.optionxform:
+                graph = OverlayGraph(self, self.base.graph).compile()
+            self._graph = graph or Graph(self).compile()
+        return self._graph
+
+    @property
+    def tables(self):
+        self.rebase()
+        if self._tables is None:
+            graph = self.graph
+            if isinstance(graph, OverlayGraph):
+                self._tables = Tables(self, self.base.tables, graph.touched)
+            else:
+                self._tables = Tables(self)
+        return self._tables
@@ -30,47 +30,292 @@ Usage:
 
 
 import argparse
+from collections.abc import Mapping
+import concurrent.futures
 import configparser
+import contextlib
+import functools
 import itertools
+import os
 import pathlib
 import re
 import sys
+import time
 
-try:
-    import tomllib
-except ImportError:
-    import tomli as tomllib
+from confusion.graph import Graph
+from confusion.lexer import Lexer
+from confusion.tables import TableBuilder
+from confusion.tables import Tables
+from confusion.tables import tomllib
+from confusion.tables import Unresolved
+
+
+class Sections(Mapping):
+    """
+    A live view of the sections of a parser, without DEFAULT.
+
+    """
+
+    __slots__ = ("proxies", "default")
+
+    def __init__(self, parser):
+        self.proxies = parser._proxies
+        self.default = parser.default_section
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+    def __contains__(self, key):
+        return key != self.default and key in self.proxies
+
+    def __getitem__(self, key):
+        if key == self.default:
+            raise KeyError(key)
+        return self.proxies[key]
+
+    def __iter__(self):
+        default = self.default
+        return (i for i in self.proxies if i != default)
+
+    def __len__(self):
+        return len(self.proxies) - (self.default in self.proxies)
 
 
 class TOMLParser(configparser.ConfigParser):
 
+    read_options = (
+        "allow_no_value", "delimiters", "comment_prefixes", "inline_comment_prefixes",
+        "strict", "empty_lines_in_values",
+    )
+
     @classmethod
     def from_string(cls, text, **kwargs):
         rv = cls(**kwargs)
         rv.read_string(text)
         return rv
 
-    def __init__(self, *args, interpolation=None, **kwargs):
+    @classmethod
+    def from_file(cls, source, encoding=None, **kwargs):
+        """
+        Read a file line by line, without holding its full text in memory.
+
+        """
+        rv = cls(**kwargs)
+        with open(source, encoding=encoding) as fp:
+            rv.read_file(fp, source=str(source))
+        return rv
+
+    def __init__(self, *args, interpolation=None, stats=None, **kwargs):
+        self.generation = 0
+        self.stats = stats
+        self._batch = None
+        self._graph = None
+        self._tables = None
+        self._builder = TableBuilder(stats=stats)
+        # Kept to configure other parsers, since configparser does not expose them all
+        self.settings = {k: kwargs[k] for k in self.read_options if k in kwargs}
+        if len(args) > 2:
+            self.settings["allow_no_value"] = args[2]
         interpolation = interpolation or configparser.ExtendedInterpolation()
-        super().__init__(interpolation=interpolation, **kwargs)
+        super().__init__(*args, interpolation=interpolation, **kwargs)
         self.SECTCRE = re.compile("\[\s*(?P<header>\S+)\s*\]")
         self.optionxform = str
 
+    @staticmethod
+    def fragment(path, encoding=None, **kwargs):
+        """
+        Read a single file without interpolation.
+
+        Returns its raw defaults and sections, with the time taken,
+        or None if the file cannot be opened.
+
+        """
+        start = time.perf_counter()
+        rv = TOMLParser(interpolation=configparser.Interpolation(), **kwargs)
+        try:
+            with open(path, encoding=encoding) as fp:
+                rv.read_file(fp, source=os.fspath(path))
+        except OSError:
+            return None
+        sections = {k: dict(v) for k, v in rv._sections.items()}
+        return dict(rv._defaults), sections, time.perf_counter() - start
+
+    def fragments(self, filenames, encoding=None, workers=None):
+        """
+        Read files in a pool of processes, with the same options as this parser.
+
+        Returns a fragment for each file, in the order given.
+
+        """
+        options = dict(self.settings, default_section=self.default_section)
+        task = functools.partial(self.fragment, encoding=encoding, **options)
+
+        if workers == 1 or len(filenames) < 2:
+            return [task(i) for i in filenames]
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(task, filenames))
+
+    def read_parallel(self, filenames, encoding=None, workers=None):
+        """
+        Read files in a pool of processes, then merge them in their original order.
+
+        Like `read`, files which cannot be opened are skipped. Returns a dictionary
+        of the files read, with the seconds spent parsing each one.
+
+        """
+        if isinstance(filenames, (str, bytes, os.PathLike)):
+            filenames = [filenames]
+
+        fragments = self.fragments(filenames, encoding=encoding, workers=workers)
+        rv = {}
+        with self.batch():
+            for path, fragment in zip(filenames, fragments):
+                if fragment is not None:
+                    defaults, sections, rv[os.fspath(path)] = fragment
+                    self.read_raw(defaults, sections)
+        return rv
+
+    def read_raw(self, defaults, sections):
+        """
+        Take on raw values which have been read already, by another parser or from a cache.
+
+        """
+        self._defaults.update(defaults)
+        for name, options in sections.items():
+            if name not in self._sections:
+                self._sections[name] = self._dict()
+                self._proxies[name] = configparser.SectionProxy(self, name)
+            self._sections[name].update(options)
+        self.invalidate()
+        return self
+
+    def __setitem__(self, key, value):
+        self.invalidate()
+        try:
+            super().__setitem__(key, value)
+        finally:
+            self.invalidate()
+
     @property
     def sections(self):
-        return {k: v for k, v in self.items() if k != self.default_section}
+        return Sections(self)
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = Graph(self).compile()
+        return self._graph
 
     @property
     def literals(self):
-        d = self.defaults()
-        return {k: dict(d, **s) for k, s in self.sections.items()}
+        graph = self.graph
+        return {k: graph.literal(k) for k in self.sections}
 
     @property
     def tables(self):
-        text = self.write_string()
-        return tomllib.loads(text)
+        if self._tables is None:
+            self._tables = Tables(self)
+        return self._tables
+
+    def table(self, name):
+        try:
+            path = self._builder.key_path(name)
+        except Unresolved:
+            raise KeyError(name) from None
+        return self.tables.table(path)
+
+    def invalidate(self, keys=None):
+        """
+        Discard cached values. Every mutation calls this and bumps `generation`.
+
+        When `keys` is a collection of (section, option) pairs, only values which
+        depend on those options are discarded. An option of None stands for a
+        section which has been added or removed.
+
+        """
+        if self._batch is not None:
+            self._batch.update(keys if keys is not None else [None])
+            return
+
+        self.generation += 1
+        dirty = None
+        if keys is not None and self._graph is not None:
+            dirty = self._graph.update(keys)
+
+        if dirty is None:
+            self._graph = None
+            self._tables = None
+        elif self._tables is not None:
+            self._tables = self._tables.renew(dirty)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Defer invalidation until the end of a block of changes, then invalidate once.
+
+        """
+        if self._batch is not None:
+            yield self
+            return
+
+        self._batch = set()
+        try:
+            yield self
+        finally:
+            keys, self._batch = self._batch, None
+            if None in keys:
+                self.invalidate()
+            elif keys:
+                self.invalidate(keys)
+
+    def add_section(self, section):
+        super().add_section(section)
+        self.invalidate([(section, None)])
+
+    def remove_section(self, section):
+        rv = super().remove_section(section)
+        if rv:
+            self.invalidate([(section, None)])
+        return rv
+
+    def set(self, section, option, value=None):
+        section = section or self.default_section
+        if section == self.default_section:
+            options = self._defaults
+        else:
+            options = self._sections.get(section, {})
+
+        key = self.optionxform(option)
+        if key in options and options[key] == value:
+            return
+
+        super().set(section, option, value)
+        self.invalidate({(section, option)})
+
+    def remove_option(self, section, option):
+        rv = super().remove_option(section, option)
+        if rv:
+            self.invalidate({(section or self.default_section, option)})
+        return rv
+
+    def _read(self, fp, fpname):
+        read = Lexer(self).read if Lexer.supports(self) else super()._read
+        try:
+            if self.stats is None:
+                return read(fp, fpname)
+            with self.stats.timer("read"):
+                return read(fp, fpname)
+        finally:
+            self.invalidate()
 
     def write_string(self):
+        if self.stats is not None:
+            with self.stats.timer("write_string"):
+                return self._write_string()
+        return self._write_string()
+
+    def _write_string(self):
         rv = [
             itertools.chain(
                 (f"[{l}]",),
@@ -83,11 +328,11 @@ class TOMLParser(configparser.ConfigParser):
 
 def main(args):
     if not args.input:
-        text = sys.stdin.read()
+        conf = TOMLParser()
+        conf.read_file(sys.stdin)
     else:
-        text = args.input.read_text()
+        conf = TOMLParser.from_file(args.input)
 
-    conf = TOMLParser.from_string(text)
     print(conf.write_string(), file=sys.stdout)
 
 
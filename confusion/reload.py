@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Reloads a configuration file when it changes, for long-running services::
+
+    reloader = Reloader("app.cfn").merge(os.environ)
+    reloader.subscribe(lambda config, changes: print(changes))
+    reloader.start(interval=2.0)
+    ...
+    port = reloader.config.current["server"]["port"]
+
+Or, from a coroutine::
+
+    async for changes in reloader.updates(interval=2.0):
+        ...
+
+"""
+
+import asyncio
+import configparser
+import hashlib
+import pathlib
+import threading
+import time
+
+from confusion.cache import Cache
+from confusion.config import Config
+from confusion.watch import Watcher
+
+
+class Reloader:
+    """
+    Checks a file for changes; first its modification time and size, then a hash of its
+    contents. A burst of writes is allowed to settle for `debounce` seconds before the
+    file is read again.
+
+    A new config takes on every merge made through the reloader, and must resolve before
+    it replaces the current one. Subscribers are then called with the config and the set
+    of (section, option) pairs whose values have changed. The option is None for a
+    section which has been added or removed.
+
+    """
+
+    @staticmethod
+    def digest(path):
+        try:
+            with Cache.view(path) as data:
+                return hashlib.sha256(data).digest()
+        except OSError:
+            return None
+
+    @staticmethod
+    def diff(old, new):
+        before = {k: dict(v) for k, v in old.literals.items()}
+        after = {k: dict(v) for k, v in new.literals.items()}
+        rv = {(k, None) for k in before.keys() ^ after.keys()}
+        for name in before.keys() & after.keys():
+            a, b = before[name], after[name]
+            rv.update((name, k) for k in a.keys() | b.keys() if a.get(k, a) != b.get(k, b))
+        return rv
+
+    def __init__(self, path, cls=Config, debounce=0.5, **kwargs):
+        self.path = pathlib.Path(path)
+        self.cls = cls
+        self.debounce = debounce
+        self.kwargs = kwargs
+        self.overrides = []
+        self.subscribers = []
+        self.error = None
+        self.pending = None
+        self.lock = threading.Lock()
+        self.watcher = Watcher([self.path])
+        self.hash = self.digest(self.path)
+        self.config = cls.from_path(self.path, **kwargs)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def merge(self, data, sep="_"):
+        """Merge `data` into the current config, and into every one loaded later."""
+        with self.lock:
+            self.overrides.append((dict(data), sep))
+            self.config.merge(data, sep=sep)
+        return self
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def check(self, now=None):
+        """
+        Reload the file if it has changed and settled.
+
+        Returns the set of changes, or None if the config was not replaced.
+
+        """
+        now = time.monotonic() if now is None else now
+        if self.watcher.changes():
+            self.pending = now
+        if self.pending is None or now - self.pending < self.debounce:
+            return None
+
+        self.pending = None
+        digest = self.digest(self.path)
+        if digest is None or digest == self.hash:
+            return None
+        return self.reload(digest)
+
+    def reload(self, digest=None):
+        """Read the file again, and replace the current config if it resolves."""
+        with self.lock:
+            try:
+                rv = self.cls.from_path(self.path, **self.kwargs)
+                for data, sep in self.overrides:
+                    rv.merge(data, sep=sep)
+                dict(rv.tables)
+            except (OSError, ValueError, configparser.Error) as e:
+                # A half written file may fail to decode as well as to parse
+                self.error = e
+                return None
+
+            old = self.config
+            changes = self.diff(old, rv)
+            if old._snapshot is not None:
+                rv.snapshot()
+            self.config = rv
+            self.hash = digest or self.digest(self.path)
+            self.error = None
+
+        for callback in list(self.subscribers):
+            callback(rv, changes)
+        return changes
+
+    async def updates(self, interval=1.0, executor=None):
+        """
+        Generate the changes of each reload, checking in an executor every `interval` seconds.
+
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                rv = await loop.run_in_executor(executor, self.check)
+            except Exception as e:
+                self.error = e
+                rv = None
+            if rv is not None:
+                yield rv
+            else:
+                await asyncio.sleep(interval)
+
+    def run(self, interval=1.0):
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception as e:
+                # The thread outlives a failed check, to try again at the next
+                self.error = e
+
+    def start(self, interval=1.0):
+        """Check for changes in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, args=(interval,), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self
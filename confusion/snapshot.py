@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Frozen copies of a resolved configuration, for readers in other threads.
+
+"""
+
+import collections.abc
+import types
+
+
+class Snapshot(collections.abc.Mapping):
+
+    __slots__ = ("tables", "literals", "generation", "path")
+
+    @staticmethod
+    def freeze(obj):
+        """
+        Return a read-only copy of `obj`; mappings become mapping proxies and lists tuples.
+
+        """
+        if isinstance(obj, collections.abc.Mapping):
+            return types.MappingProxyType({k: Snapshot.freeze(v) for k, v in obj.items()})
+        elif isinstance(obj, (list, tuple)):
+            return tuple(Snapshot.freeze(i) for i in obj)
+        else:
+            return obj
+
+    @classmethod
+    def from_parser(cls, parser):
+        return cls(
+            tables=dict(parser.tables),
+            literals=parser.literals,
+            generation=parser.generation,
+            path=getattr(parser, "path", None),
+        )
+
+    def __init__(self, tables, literals, generation=0, path=None):
+        object.__setattr__(self, "tables", self.freeze(tables))
+        object.__setattr__(self, "literals", self.freeze(literals))
+        object.__setattr__(self, "generation", generation)
+        object.__setattr__(self, "path", path)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} generation={self.generation} tables={list(self.tables)}>"
+
+    def __getitem__(self, key):
+        return self.tables[key]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def __len__(self):
+        return len(self.tables)
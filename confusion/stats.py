@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Optional instrumentation of the phases of loading a configuration.
+
+Pass a Stats object to a parser to collect timings and counts::
+
+    stats = Stats(logger=logging.getLogger("confusion.stats"))
+    conf = Config.from_path(path, stats=stats)
+    dict(conf.tables)
+    print(stats.report())
+
+Phases may nest. For example, the time in "toml" includes that of any
+"write_string" it calls.
+
+"""
+
+import collections
+import contextlib
+import time
+
+
+class Stats:
+
+    def __init__(self, logger=None):
+        self.timers = collections.defaultdict(float)
+        self.counters = collections.Counter()
+        self.logger = logger
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.report()!r})"
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timers[phase] += elapsed
+            self.counters[phase] += 1
+            if self.logger is not None:
+                self.logger.debug(
+                    "%s took %.6fs", phase, elapsed, extra={"phase": phase, "seconds": elapsed}
+                )
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def hit(self, cache):
+        self.counters[f"{cache}.hits"] += 1
+
+    def miss(self, cache):
+        self.counters[f"{cache}.misses"] += 1
+
+    def hit_rate(self, cache):
+        hits, misses = self.counters[f"{cache}.hits"], self.counters[f"{cache}.misses"]
+        return hits / (hits + misses) if hits + misses else None
+
+    @property
+    def caches(self):
+        return sorted({k.rpartition(".")[0] for k in self.counters if k.endswith((".hits", ".misses"))})
+
+    def report(self):
+        return {
+            "timers": dict(self.timers),
+            "counters": dict(self.counters),
+            "hit_rates": {k: self.hit_rate(k) for k in self.caches},
+        }
+
+    def log(self, level=20):
+        """Emit a summary as a single record, at INFO level by default."""
+        if self.logger is not None:
+            self.logger.log(level, "%s", self.report(), extra={"stats": self.report()})
+        return self
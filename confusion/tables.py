@@ -0,0 +1,367 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Builds TOML tables directly from interpolated option values.
+
+Each value is parsed on its own and the nested tables are assembled in
+Python. Anything the fast path cannot vouch for (quoted or conflicting
+keys, values which spill into other keys) raises `Unresolved` so that the
+caller may fall back to a full parse of the serialised document.
+
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+import copy
+import functools
+import itertools
+import re
+
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+
+class Unresolved(Exception):
+    pass
+
+
+class TableBuilder:
+
+    bare_key = re.compile(r"[A-Za-z0-9_-]+(?:\.[A-Za-z0-9_-]+)*")
+    literal = re.compile(
+        r"(?P<int>[+-]?(?:0|[1-9][0-9]*))"
+        r"|(?P<float>[+-]?(?:0|[1-9][0-9]*)(?:\.[0-9]+(?:[eE][+-]?[0-9]+)?|[eE][+-]?[0-9]+))"
+        r'|(?P<str>"[^"\\\x00-\x08\x0a-\x1f\x7f]*"'
+        r"|'[^'\x00-\x08\x0a-\x1f\x7f]*')"
+        r"|(?P<bool>true|false)"
+    )
+    conversions = {
+        "int": int,
+        "float": float,
+        "str": lambda x: x[1:-1],
+        "bool": lambda x: x == "true",
+    }
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def key_path(text):
+        if TableBuilder.bare_key.fullmatch(text):
+            return tuple(text.split("."))
+
+        try:
+            data = tomllib.loads(f"{text} = 0")
+        except tomllib.TOMLDecodeError:
+            raise Unresolved(text) from None
+
+        rv = []
+        while isinstance(data, dict) and len(data) == 1:
+            k, data = next(iter(data.items()))
+            rv.append(k)
+
+        if not rv or data != 0:
+            raise Unresolved(text)
+        return tuple(rv)
+
+    def __init__(self, stats=None, maxsize=4096):
+        self.values = OrderedDict()
+        self.maxsize = maxsize
+        self.stats = stats
+
+    def value(self, text):
+        try:
+            rv = self.values[text]
+        except KeyError:
+            rv = self.values[text] = self.parse(text)
+            if len(self.values) > self.maxsize:
+                # Least recently used first
+                self.values.popitem(last=False)
+            if self.stats is not None:
+                self.stats.miss("literals")
+        else:
+            self.values.move_to_end(text)
+            if self.stats is not None:
+                self.stats.hit("literals")
+
+        return copy.deepcopy(rv) if isinstance(rv, (list, dict)) else rv
+
+    def parse(self, text):
+        if text is None:
+            raise Unresolved(text)
+
+        match = self.literal.fullmatch(text)
+        if match:
+            return self.conversions[match.lastgroup](text)
+
+        if self.stats is not None:
+            self.stats.count("toml.parses")
+
+        try:
+            data = tomllib.loads(f"v = {text}")
+        except tomllib.TOMLDecodeError:
+            raise Unresolved(text) from None
+        if len(data) != 1:
+            raise Unresolved(text)
+        return data["v"]
+
+    def build(self, sections):
+        """
+        Assemble nested tables from an iterable of (name, values) pairs.
+
+        """
+        rv = {}
+        tables = {id(rv)}
+        defined = set()
+        dotted = set()
+        for name, values in sections:
+            table = rv
+            for key in self.key_path(name):
+                table = self.descend(table, key, tables)
+
+            if id(table) in defined:
+                raise Unresolved(name)
+            defined.add(id(table))
+
+            for option, text in values.items():
+                *keys, key = self.key_path(option)
+                node = table
+                for k in keys:
+                    node = self.descend(node, k, dotted)
+                if key in node:
+                    raise Unresolved(option)
+                node[key] = self.value(text)
+        return rv
+
+    @staticmethod
+    def descend(table, key, ids):
+        try:
+            rv = table[key]
+        except KeyError:
+            rv = table[key] = {}
+            ids.add(id(rv))
+        else:
+            if id(rv) not in ids:
+                raise Unresolved(key)
+        return rv
+
+
+class Tables(Mapping):
+    """
+    A lazy view of the typed tables of a parser.
+
+    Tables are built on first access, one top level key at a time, and
+    memoised until the parser is next modified. A view held across a
+    modification follows the parser.
+
+    With a `base`, tables are copied from the base when first read, unless
+    they derive from a section named in `changed`.
+
+    """
+
+    def __init__(self, parser, base=None, changed=()):
+        self.parser = parser
+        self.base = base
+        self.changed = {}
+        if base is not None:
+            try:
+                self.changed = {i: parser._builder.key_path(i) for i in changed}
+            except Unresolved:
+                self.base = None
+        self.roots = {i[0] for i in self.changed.values()}
+        self.literals = {}
+        self.resolved = {}
+        self.document_parsed = False
+        self._index = None
+
+    def renew(self, dirty):
+        """
+        Return a view for the next generation of the parser.
+
+        Memoised values are carried over unless they derive from a section named in `dirty`.
+
+        """
+        try:
+            paths = {i: self.parser._builder.key_path(i) for i in dirty}
+        except Unresolved:
+            return Tables(self.parser)
+
+        if self.base is None:
+            rv = Tables(self.parser)
+        else:
+            rv = Tables(self.parser, self.base, itertools.chain(self.changed, dirty))
+        if self.document_parsed:
+            return rv
+
+        roots = {i[0] for i in paths.values()}
+        rv._index = self.reindex(self._index, paths)
+        rv.literals = {k: v for k, v in self.literals.items() if k not in dirty}
+        rv.resolved = {k: v for k, v in self.resolved.items() if k[0] not in roots}
+        return rv
+
+    def reindex(self, index, paths):
+        """
+        Return an index which takes account of sections added or removed, sharing what is unchanged.
+
+        Returns None when the index must be built again to keep the order of the sections.
+
+        """
+        if index is None:
+            return None
+
+        sections = self.parser._sections
+        rv = index
+        for name, path in paths.items():
+            entries = rv.get(path[0], [])
+            entry = (name, path)
+            present = entry in entries
+            if present == (name in sections):
+                continue
+
+            if rv is index:
+                rv = dict(index)
+
+            if not present:
+                rv[path[0]] = entries + [entry]
+            elif entries[0] == entry and len(entries) > 1:
+                # The root would move to the place of its next section
+                return None
+            elif len(entries) == 1:
+                del rv[path[0]]
+            else:
+                rv[path[0]] = [i for i in entries if i != entry]
+        return rv
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    @property
+    def current(self):
+        """
+        The view of the parser as it is now. A view held across a change forwards to it.
+
+        """
+        return self.parser.tables
+
+    def __iter__(self):
+        current = self.current
+        if current is not self:
+            return iter(current)
+        return iter(self.index)
+
+    def __len__(self):
+        current = self.current
+        if current is not self:
+            return len(current)
+        return len(self.index)
+
+    def __getitem__(self, key):
+        current = self.current
+        if current is not self:
+            return current[key]
+        if key not in self.index:
+            raise KeyError(key)
+        return self.table((key,))
+
+    @property
+    def index(self):
+        if self._index is None and self.base is not None:
+            self._index = self.reindex(self.base.index, self.changed)
+
+        if self._index is None:
+            rv = {}
+            try:
+                for name in self.parser.sections:
+                    path = self.parser._builder.key_path(name)
+                    rv.setdefault(path[0], []).append((name, path))
+            except Unresolved:
+                rv = dict.fromkeys(self.document(), [])
+            self._index = rv
+        return self._index
+
+    def document(self):
+        stats = getattr(self.parser, "stats", None)
+        if stats is not None:
+            stats.count("toml.documents")
+            with stats.timer("toml"):
+                rv = tomllib.loads(self.parser.write_string())
+        else:
+            rv = tomllib.loads(self.parser.write_string())
+        self.document_parsed = True
+        self.resolved.update({(k,): v for k, v in rv.items()})
+        return rv
+
+    def literal(self, name):
+        try:
+            return self.literals[name]
+        except KeyError:
+            rv = self.literals[name] = self.parser.graph.literal(name)
+            return rv
+
+    def table(self, path):
+        stats = getattr(self.parser, "stats", None)
+        try:
+            rv = self.resolved[path]
+        except KeyError:
+            if stats is not None:
+                stats.miss("tables")
+        else:
+            if stats is not None:
+                stats.hit("tables")
+            return rv
+
+        if self.base is not None and path[0] not in self.roots:
+            root = path[:1]
+            if root not in self.resolved:
+                # The tables of a base are shared by all its views, so each takes a copy
+                rv = self.base.table(root)
+                self.resolved[root] = copy.deepcopy(rv) if isinstance(rv, (list, dict)) else rv
+            return self._table(path) if len(path) > 1 else self.resolved[root]
+
+        if stats is not None:
+            with stats.timer("tables"):
+                return self._table(path)
+        return self._table(path)
+
+    def _table(self, path):
+        n = len(path)
+        if n > 1 and path[:1] in self.resolved:
+            rv, keys = self.resolved[path[:1]], path[1:]
+        else:
+            try:
+                sections = [
+                    (name, self.literal(name))
+                    for name, p in self.index.get(path[0], [])
+                    if p[:n] == path or path[:len(p)] == p
+                ]
+                rv = self.parser._builder.build(sections)
+            except Unresolved:
+                rv = self.document()
+            keys = path
+
+        try:
+            for key in keys:
+                rv = rv[key]
+        except (KeyError, TypeError):
+            raise KeyError(".".join(path)) from None
+
+        self.resolved[path] = rv
+        return rv
@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import copy
+import json
+import unittest
+
+from confusion.bench.data import config
+from confusion.bench.suite import Suite
+from confusion.parser import tomllib
+from confusion.parser import TOMLParser
+
+
+class TestData(unittest.TestCase):
+
+    def test_config_valid(self):
+        for depth, fanout in [(1, 0), (4, 4), (8, 6)]:
+            with self.subTest(depth=depth, fanout=fanout):
+                conf = TOMLParser.from_string(config(sections=40, keys=5, depth=depth, fanout=fanout))
+                self.assertEqual(tomllib.loads(conf.write_string()), dict(conf.tables))
+                self.assertFalse(conf.tables.document_parsed)
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        suite = Suite(sections=20, keys=4, nodes=50)
+        results = json.loads(json.dumps(suite.run(repeat=1)))
+        self.assertEqual(
+            {"parse", "literals", "tables", "write_string", "merge", "to_dot"},
+            set(results["results"])
+        )
+        self.assertEqual([], suite.compare(results, results))
+
+        baseline = copy.deepcopy(results)
+        baseline["results"]["tables"]["seconds"] = results["results"]["tables"]["seconds"] / 2
+        regressions = suite.compare(results, baseline, threshold=1.5)
+        self.assertEqual([("tables", "seconds")], [i[:2] for i in regressions])
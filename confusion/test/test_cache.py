@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import configparser
+import datetime
+import pathlib
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import patch
+
+from confusion.cache import Cache
+from confusion.config import Config
+
+
+class TestCache(unittest.TestCase):
+
+    text = textwrap.dedent("""
+    [DEFAULT]
+    flake = false
+
+    [A]
+    flavour = "strawberry"
+    when = 1979-05-27T07:32:00-08:00
+    dates = [1979-05-27, 07:32:00]
+
+    [B]
+    flavour = ${A:flavour}
+
+    [B.C]
+    size = 2
+    """)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = pathlib.Path(self.dir.name, "cache")
+        self.path = pathlib.Path(self.dir.name, "test.cfn")
+        self.path.write_text(self.text)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_encode_round_trip(self):
+        data = Config.from_string(self.text).table("A")
+        self.assertEqual(data, Cache.decode(Cache.encode(data)))
+        self.assertIsInstance(Cache.decode(Cache.encode(data))["when"], datetime.datetime)
+
+    def test_miss_then_hit(self):
+        expected = Config.from_path(self.path)
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual(dict(expected.tables), dict(rv.tables))
+        self.assertEqual(1, len(list(self.cache.glob("*.cfc"))))
+
+        with patch.object(Config, "_read", side_effect=AssertionError):
+            rv = Config.from_path(self.path, cache=self.cache)
+
+        self.assertIsInstance(rv, Config)
+        self.assertEqual(self.path, rv.path)
+        self.assertEqual(dict(expected.tables), dict(rv.tables))
+        self.assertEqual(expected.literals, rv.literals)
+        self.assertEqual(expected.write_string(), rv.write_string())
+
+    def test_hit_remains_mutable(self):
+        Config.from_path(self.path, cache=self.cache)
+        rv = Config.from_path(self.path, cache=self.cache)
+        rv.merge({"A_flavour": "banana"})
+        self.assertEqual("banana", rv.tables["B"]["flavour"])
+
+    def test_stale_entry_ignored(self):
+        Config.from_path(self.path, cache=self.cache)
+        self.path.write_text(self.text.replace("strawberry", "vanilla"))
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("vanilla", rv.tables["B"]["flavour"])
+        self.assertEqual(2, len(list(self.cache.glob("*.cfc"))))
+
+    def test_replaced_while_parsing(self):
+        key = Cache.key
+
+        def replace(*args, **kwargs):
+            rv = key(*args, **kwargs)
+            new = self.path.with_suffix(".new")
+            new.write_text(self.text.replace("strawberry", "vanilla"))
+            new.replace(self.path)
+            return rv
+
+        with patch.object(Cache, "key", autospec=True, side_effect=replace):
+            rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("strawberry", rv.tables["B"]["flavour"])
+
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("vanilla", rv.tables["B"]["flavour"])
+
+        self.path.write_text(self.text)
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("strawberry", rv.tables["B"]["flavour"])
+
+    def test_corrupt_entry_rejected(self):
+        Config.from_path(self.path, cache=self.cache)
+        entry = next(self.cache.glob("*.cfc"))
+        data = bytearray(entry.read_bytes())
+        data[-8:] = b"\xff" * 8
+        entry.write_bytes(bytes(data))
+
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("strawberry", rv.tables["B"]["flavour"])
+
+        entry.write_bytes(b"nonsense")
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertEqual("strawberry", rv.tables["B"]["flavour"])
+
+    def test_unresolved_not_cached(self):
+        self.path.write_text("[A]\nflavour = ${B:flavour}")
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertIsInstance(rv, Config)
+        self.assertFalse(list(self.cache.glob("*.cfc")))
+
+    def test_options_in_key(self):
+        cache = Cache(self.cache)
+        self.assertNotEqual(
+            cache.key(self.text, Config, {}),
+            cache.key(self.text, Config, {"default_section": "ALL"}),
+        )
+        self.assertIsNone(cache.key(self.text, Config, {"interpolation": configparser.Interpolation()}))
+
+    def test_empty_file(self):
+        self.path.write_text("")
+        Config.from_path(self.path, cache=self.cache)
+        rv = Config.from_path(self.path, cache=self.cache)
+        self.assertFalse(rv.tables)
+        self.assertEqual(1, len(list(self.cache.glob("*.cfc"))))
@@ -1,11 +1,29 @@
 #! /usr/bin/env python
 # encoding: utf-8
 
+import contextlib
+import gc
+import gzip
+import io
+import os
+import pathlib
+import stat
+import tempfile
 import unittest
+from unittest import mock
+import weakref
 
 
+from confusion.parser import tomllib
+from confusion.parser import TOMLParser
+from confusion.utils.cfn2dot import Build
 from confusion.utils.cfn2dot import Model
 from confusion.utils.cfn2dot import Node
+from confusion.utils.cfn2dot import parser
+from confusion.utils.cfn2dot import publish
+from confusion.utils.cfn2dot import sink
+from confusion.utils.cfn2dot import watch
+from confusion.utils.cfn2dot import write
 
 
 class TestLoad(unittest.TestCase):
@@ -69,6 +87,24 @@ class TestLoad(unittest.TestCase):
         model = Model.loads(text)
         self.assertEqual({"a", "b"}, model.graphs)
 
+    def test_model_freed(self):
+        model = Model.loads("[A]\n[A.B]")
+        self.assertEqual(["A.B"], model.children("A"))
+        ref = weakref.ref(model)
+        del model
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_invalidate(self):
+        model = Model.loads("[A]\n[A.B]")
+        nodes = model.nodes
+        self.assertIs(nodes, model.nodes)
+        model.data["A"]["C"] = {}
+        model.text += "\n[A.C]"
+        self.assertIn("A.C", model.invalidate().nodes)
+        self.assertEqual(["A.B", "A.C"], model.children("A"))
+        self.assertIsNot(nodes, model.nodes)
+
     def test_loads(self):
         text = """
         [A]
@@ -94,9 +130,27 @@ class TestNode(unittest.TestCase):
         self.assertEqual("test node", node.label)
         self.assertEqual(1, node.weight)
         self.assertIsInstance(node.weight, float)
-        self.assertEqual([], node.arcs)
+        self.assertEqual((), node.arcs)
         self.assertTrue(hash(node))
 
+    def test_node_slots(self):
+        node = Node(name="test node")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIs(Node(name="other").color, node.fill)
+
+    def test_node_data_dropped(self):
+        text = """
+        [A]
+        [A.B]
+        [A.B.c]
+        target = "A"
+        """
+        model = Model(text, tomllib.loads(text), keep_data=False)
+        self.assertIsNone(model.nodes["A.B"].data)
+        self.assertEqual(1, len(model.nodes["A.B"].arcs))
+        self.assertIsInstance(model.nodes["A.B"].arcs, tuple)
+        self.assertEqual("A.B", model.nodes["A.B"].arcs[0].node)
+
     def test_node_parent_root(self):
         text = """
         [A]
@@ -145,6 +199,31 @@ class TestNode(unittest.TestCase):
         self.assertEqual(["A.B.C"], model.children("A"))
         self.assertEqual("C", model.nodes["C.B.C"].parent)
 
+    def test_node_children_prefix(self):
+        text = """
+        [A1]
+        [A10]
+        [A1.B]
+        [A1.B.C]
+        """
+        model = Model.loads(text)
+        self.assertEqual(["A1.B"], model.children("A1"))
+        self.assertEqual(["A1.B.C"], model.children("A1.B"))
+        self.assertEqual([], model.children("A10"))
+        self.assertEqual("A1.B", model.nodes["A1.B.C"].parent)
+
+    def test_subgraphs_unique(self):
+        text = """
+        [A]
+        [A.B]
+        [A.B.C]
+        [A.D]
+        [E]
+        """
+        model = Model.loads(text)
+        names = [i.name for i in model.subgraphs() if i is not None]
+        self.assertEqual(["A", "A.B", "A.B.C", "A.D", "E"], names)
+
     def test_node_rank(self):
         text = """
         [A]
@@ -171,6 +250,23 @@ class TestNode(unittest.TestCase):
         self.assertEqual(1, len(model.nodes["A.B"].arcs))
         self.assertEqual(1, len(model.nodes["C"].arcs))
 
+    def test_colours_shared(self):
+        text = """
+        [A]
+        color = {r = 255, g = 0, b = 0}
+        [B]
+        color = {r = 255, g = 0, b = 0}
+        fill = {r = 255, g = 0, b = 0, a = 128}
+        """
+        model = Model.loads(text)
+        self.assertIs(model.nodes["A"].color, model.nodes["B"].color)
+        self.assertEqual("#ff0000ff", Model.hex(model.nodes["A"].color))
+        self.assertEqual("#ff0000", Model.hex(model.nodes["B"].fill, alpha=False))
+        self.assertEqual(
+            'color="#000000ff" fontcolor="#ff0000" fillcolor="#ff000080"',
+            Model.style(model.nodes["B"].stroke, model.nodes["B"].color, model.nodes["B"].fill, (True, False, True))
+        )
+
     def test_node_to_dot(self):
         text = """
         [A]
@@ -181,3 +277,174 @@ class TestNode(unittest.TestCase):
         model = Model.loads(text)
         self.assertEqual(4, len(model.nodes))
         self.assertEqual("C", model.nodes["C.B.C"].parent)
+
+
+class TestWriter(unittest.TestCase):
+
+    text = """
+    [A]
+    [A.B]
+    [C]
+    [C.ab]
+    target = "A.B"
+    """
+
+    def test_write_chunks(self):
+        model = Model.loads(self.text)
+        model.args = parser().parse_args(["test.cfn"])
+        expected = list(model.to_dot())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp, "test.dot")
+            with sink(path) as stream:
+                self.assertEqual(len(expected), write(model.to_dot(), stream, chunk=3))
+            self.assertEqual("\n".join(expected) + "\n", path.read_text())
+
+    def test_write_gzip(self):
+        model = Model.loads(self.text)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp, "test.dot.gz")
+            with sink(path, compress=True) as stream:
+                n = write(model.to_cluster(), stream)
+            with gzip.open(path, "rt") as source:
+                self.assertEqual(n, len(source.read().splitlines()))
+
+    def test_from_parser(self):
+        conf = TOMLParser.from_string(self.text)
+        model = Model.from_parser(conf, args=parser().parse_args(["test.cfn"]))
+        expected = Model.loads(self.text)
+        expected.args = model.args
+        self.assertEqual(expected.tables, model.tables)
+        self.assertEqual(list(expected.to_dot()), list(model.to_dot()))
+
+        conf = TOMLParser.from_string('[A-1]\n["A-1".B]\nlabel = "quoted"')
+        model = Model.from_parser(conf)
+        self.assertEqual(["A-1", '"A-1".B'], list(model.nodes))
+        self.assertEqual("quoted", model.nodes['"A-1".B'].label)
+        self.assertEqual("A-1", model.nodes['"A-1".B'].parent)
+
+    def test_stable_ids(self):
+        model = Model.loads(self.text)
+        model.args = parser().parse_args(["test.cfn"])
+        self.assertEqual({"A": 0, "A.B": 1, "C": 2}, model.ids)
+        other = Model.loads(self.text)
+        other.args = model.args
+        for method in ("to_dot", "to_cluster"):
+            with self.subTest(method=method):
+                self.assertEqual(list(getattr(model, method)()), list(getattr(other, method)()))
+        self.assertTrue(any(i.startswith('2 -> 1 [ label="ab"') for i in model.to_dot()))
+
+
+class TestBuild(unittest.TestCase):
+
+    files = {
+        "a.cfn": """
+        [DEFAULT]
+        weight = 1.0
+        [A]
+        label = "Animal"
+        [A.B]
+        label = "Bird"
+        [C]
+        label = "Cat"
+        [C.chases]
+        target = "A.B"
+        """,
+        "b.cfn": """
+        [D]
+        label = "Dog"
+        [D.E]
+        label = ${C:label}
+        [A.B]
+        weight = 2.0
+        """,
+    }
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.paths = [pathlib.Path(self.dir.name, name) for name in self.files]
+        for path in self.paths:
+            path.write_text(self.files[path.name])
+        self.args = parser().parse_args([str(i) for i in self.paths])
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def check(self, build):
+        expected = Build(self.paths, args=self.args)
+        self.assertEqual(list(expected.model.nodes), list(build.model.nodes))
+        self.assertEqual(list(expected.model.to_dot()), list(build.model.to_dot()))
+
+    def test_parity(self):
+        build = Build(self.paths, args=self.args)
+        conf = TOMLParser()
+        conf.read(self.paths)
+        model = Model(conf.write_string(), conf.tables, args=self.args)
+        self.assertEqual(list(model.to_dot()), list(build.model.to_dot()))
+
+    def test_update_value(self):
+        build = Build(self.paths, args=self.args)
+        dog, animal = build.model.nodes["D"], build.model.nodes["A"]
+        self.paths[0].write_text(self.files["a.cfn"].replace('"Cat"', '"Lion"'))
+        self.assertEqual({"C", "D"}, build.update(self.paths[:1]))
+        self.assertIsNot(dog, build.model.nodes["D"])
+        self.assertIs(animal, build.model.nodes["A"])
+        self.assertEqual("Lion", build.model.nodes["D.E"].label)
+        self.check(build)
+
+    def test_update_sections(self):
+        build = Build(self.paths, args=self.args)
+        self.paths[1].write_text(self.files["b.cfn"].replace("[D.E]", "[D.F]") + "\n[G]\n")
+        self.assertEqual({"D", "G"}, build.update(self.paths[1:]))
+        self.assertIn("D.F", build.model.nodes)
+        self.assertNotIn("D.E", build.model.nodes)
+        self.check(build)
+
+    def test_update_order(self):
+        build = Build(self.paths, args=self.args)
+        self.paths[0].write_text("[Z]\n" + self.files["a.cfn"])
+        self.assertIsNone(build.update(self.paths[:1]))
+        self.check(build)
+
+    def test_publish_unchanged(self):
+        build = Build(self.paths, args=self.args)
+        output = pathlib.Path(self.dir.name, "output.dot.gz")
+        n, changed = publish(build.model.to_dot(), output, compress=True)
+        self.assertTrue(changed)
+        stamp = output.stat().st_mtime_ns
+        self.assertEqual((n, False), publish(build.model.to_dot(), output, compress=True))
+        self.assertEqual(stamp, output.stat().st_mtime_ns)
+        self.assertEqual(1, len(list(output.parent.glob("output*"))))
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_publish_mode(self):
+        build = Build(self.paths, args=self.args)
+        output = pathlib.Path(self.dir.name, "output.dot")
+        umask = os.umask(0o022)
+        try:
+            publish(build.model.to_dot(), output)
+        finally:
+            os.umask(umask)
+        self.assertEqual(0o644, stat.S_IMODE(output.stat().st_mode))
+
+        output.chmod(0o640)
+        self.paths[0].write_text(self.files["a.cfn"].replace('"Cat"', '"Lion"'))
+        build.update(self.paths[:1])
+        self.assertEqual(True, publish(build.model.to_dot(), output)[1])
+        self.assertEqual(0o640, stat.S_IMODE(output.stat().st_mode))
+
+    def test_watch_survives_errors(self):
+        output = pathlib.Path(self.dir.name, "output.dot")
+        args = parser().parse_args(["--watch", "--output", str(output)] + [str(i) for i in self.paths])
+        error = UnicodeDecodeError("utf-8", b"\xc3", 0, 1, "unexpected end of data")
+        stderr = io.StringIO()
+        with mock.patch("confusion.utils.cfn2dot.Watcher") as watcher:
+            watcher.return_value.poll.side_effect = [
+                iter([[self.paths[0]]]), iter([[self.paths[0]]]), KeyboardInterrupt
+            ]
+            with mock.patch.object(Build, "update", side_effect=[error, None]) as update:
+                with contextlib.redirect_stderr(stderr):
+                    self.assertRaises(KeyboardInterrupt, watch, args)
+
+        self.assertEqual(2, update.call_count)
+        self.assertIn("Error: 'utf-8' codec", stderr.getvalue())
+        self.assertTrue(output.exists())
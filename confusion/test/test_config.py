@@ -18,13 +18,16 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 # USA
 
+import asyncio
 import os
 import pathlib
 import tempfile
 import textwrap
 import unittest
+from unittest import mock
 
 from confusion.config import Config
+from confusion.parser import tomllib
 
 
 class TestConfig(unittest.TestCase):
@@ -107,3 +110,132 @@ class TestConfig(unittest.TestCase):
         rv = Config.from_path(self.toml_path).merge(data)
         self.assertEqual("bar", rv.tables["A"]["foo"])
         self.assertNotIn("B", rv.tables)
+
+    def test_merge_invalidates(self):
+        text = textwrap.dedent("""
+        [A]
+        foo = "bar"
+
+        """)
+        self.toml_path.write_text(text)
+
+        rv = Config.from_path(self.toml_path)
+        generation = rv.generation
+        self.assertEqual("bar", rv.tables["A"]["foo"])
+        rv.merge({"A_foo": "baz"})
+        self.assertGreater(rv.generation, generation)
+        self.assertEqual("baz", rv.tables["A"]["foo"])
+
+    def test_merge_keeps_unaffected_tables(self):
+        text = textwrap.dedent("""
+        [A]
+        foo = "bar"
+
+        [B]
+        foo = ${A:foo}
+
+        [C]
+        foo = "baz"
+
+        """)
+        self.toml_path.write_text(text)
+
+        rv = Config.from_path(self.toml_path)
+        c = rv.table("C")
+        rv.merge({"A_foo": "qux"})
+        self.assertIs(c, rv.table("C"))
+        self.assertEqual("qux", rv.table("B")["foo"])
+
+    def test_encode(self):
+
+        def legacy(k, v):
+            try:
+                tomllib.loads(f"{k} = {v}")
+                return str(v)
+            except Exception:
+                return f'"{v}"'
+
+        keys = ["foo", "foo.bar", "foo bar", '"foo"', "foo/bar"]
+        values = [
+            0, 1.5, True, "", " ", "0", "007", "1_000", "-1", "+inf", "nan", "info",
+            "true", "True", "false", "1979-05-27", "07:32:00", "1979-05-27T07:32:00Z",
+            '"quoted"', "'single'", '"unterminated', "[1, 2]", "[1, ", "{a = 1}",
+            "postgres", "/usr/local/bin", "C:\\Users", "a b", " 1", "\n1", "1\nx = 2",
+        ]
+        for k in keys:
+            for v in values:
+                with self.subTest(k=k, v=v):
+                    self.assertEqual(legacy(k, v), Config.encode(k, v))
+
+    def test_merge_batch(self):
+        text = textwrap.dedent("""
+        [A]
+        foo = "bar"
+        bar = 1
+
+        """)
+        self.toml_path.write_text(text)
+
+        rv = Config.from_path(self.toml_path)
+        generation = rv.generation
+        rv.merge({"A_foo": "baz", "A_bar": 2, "A_new": "true", "B_foo": 0, "PATH": "/bin"})
+        self.assertEqual(generation + 1, rv.generation)
+        self.assertEqual({"foo": "baz", "bar": 2, "new": True}, rv.tables["A"])
+
+    def test_merge_atomic(self):
+        text = textwrap.dedent("""
+        [A]
+        foo = "bar"
+
+        """)
+        self.toml_path.write_text(text)
+
+        rv = Config.from_path(self.toml_path)
+        generation = rv.generation
+        with self.assertRaises(ValueError):
+            rv.merge({"A_foo": "baz", "A_bar": "$HOME"})
+        self.assertEqual(generation, rv.generation)
+        self.assertEqual({"foo": "bar"}, rv.tables["A"])
+
+
+class TestAsync(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.dir.name, "app.cfn")
+        self.path.write_text('[A]\nname = "alpha"\n[B]\nref = ${A:name}\n')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    async def test_aload(self):
+        rv = await Config.aload(self.path)
+        self.assertIsInstance(rv, Config)
+        self.assertEqual(self.path, rv.path)
+        self.assertEqual("alpha", rv.tables["B"]["ref"])
+        self.assertFalse(Config.loading)
+
+    async def test_aload_coalesced(self):
+        with mock.patch.object(Config, "load", wraps=Config.load) as load:
+            rv = await asyncio.gather(*(Config.aload(self.path) for _ in range(5)))
+            self.assertEqual(1, load.call_count)
+        self.assertTrue(all(i is rv[0] for i in rv))
+        self.assertIsNot(rv[0], await Config.aload(self.path))
+        self.assertFalse(Config.loading)
+
+    async def test_aload_cancelled(self):
+        first = asyncio.ensure_future(Config.aload(self.path))
+        second = asyncio.ensure_future(Config.aload(self.path))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual("alpha", (await second).tables["A"]["name"])
+
+    async def test_aload_error(self):
+        with self.assertRaises(FileNotFoundError):
+            await Config.aload(self.path.with_name("missing.cfn"))
+        self.assertFalse(Config.loading)
+
+    async def test_atables(self):
+        conf = Config.from_path(self.path)
+        rv = await conf.atables()
+        self.assertEqual({"A": {"name": "alpha"}, "B": {"ref": "alpha"}}, rv)
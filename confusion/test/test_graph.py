@@ -0,0 +1,297 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import configparser
+import unittest
+
+from confusion.graph import Graph
+from confusion.graph import InterpolationCycleError
+from confusion.parser import TOMLParser
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_plain(self):
+        self.assertIsNone(Graph.template("vanilla"))
+
+    def test_references(self):
+        self.assertEqual(
+            ("a ", (None, "x", "x"), " ", "$", " ", ("B", "y", "B:y")),
+            Graph.template("a ${x} $$ ${B:y}")
+        )
+
+    def test_faults(self):
+        for text in ("$x", "${x", "${A:B:C}"):
+            with self.subTest(text=text):
+                self.assertTrue(Graph.template(text)[-1].startswith(("'$'", "bad", "More")))
+
+
+class TestGraph(unittest.TestCase):
+
+    examples = [
+        """
+        [DEFAULT]
+        flavour = vanilla
+        flake = false
+        [A]
+        flavour = strawberry
+        [B]
+        flavour = ${A:flavour}
+        """,
+        """
+        [DEFAULT]
+        name = default
+        path = /home/${name}
+        link = ${A:name}
+        [A]
+        name = a
+        [B]
+        [C]
+        path = ${DEFAULT:path}/c
+        """,
+        """
+        [A]
+        price = $$5
+        total = ${price} + ${price}
+        [B]
+        total = ${A:total}
+        """,
+        """
+        [A]
+        x = ${B:y}
+        """,
+        """
+        [A]
+        x = ${y}
+        """,
+        """
+        [A]
+        x = $y
+        """,
+        """
+        [A]
+        x = ${A:B:C}
+        """,
+        """
+        [A]
+        x = ${y
+        """,
+    ]
+
+    @staticmethod
+    def legacy(conf):
+        d = conf.defaults()
+        return {k: dict(d, **s) for k, s in conf.sections.items()}
+
+    @staticmethod
+    def outcome(fn, conf):
+        try:
+            return repr(fn(conf))
+        except configparser.Error as e:
+            return type(e)
+
+    def test_parity(self):
+        for n, text in enumerate(self.examples):
+            with self.subTest(n=n):
+                conf = TOMLParser.from_string(text)
+                self.assertEqual(
+                    self.outcome(self.legacy, conf),
+                    self.outcome(lambda x: x.literals, conf),
+                )
+
+    def test_shared_default(self):
+        text = """
+        [DEFAULT]
+        flavour = ${A:flavour}
+        label = ${flavour} flake
+        size = ${A:size}
+        [A]
+        flavour = strawberry
+        size = 2
+        [B]
+        [C]
+        """
+        conf = TOMLParser.from_string(text)
+        literals = {k: dict(v) for k, v in conf.literals.items()}
+        self.assertEqual("strawberry flake", literals["C"]["label"])
+        self.assertIn(("DEFAULT", "size"), conf.graph.values)
+        self.assertNotIn(("B", "size"), conf.graph.values)
+        self.assertIn(("B", "label"), conf.graph.values)
+
+    def test_literal_view(self):
+        text = """
+        [DEFAULT]
+        flavour = vanilla
+        size = ${A:size}
+        [A]
+        size = 2
+        colour = red
+        [B]
+        flavour = strawberry
+        """
+        conf = TOMLParser.from_string(text)
+        view = conf.literals["B"]
+        self.assertFalse(conf.graph.values)
+        self.assertEqual(["flavour", "size"], list(view))
+        self.assertEqual(2, len(view))
+        self.assertNotIn("colour", view)
+        self.assertEqual({"flavour": "strawberry", "size": "2"}, view)
+        self.assertIn(("DEFAULT", "size"), conf.graph.values)
+        self.assertNotIn(("B", "size"), conf.graph.values)
+
+    def test_deep_chain(self):
+        text = "\n".join(
+            ["[S0]", "x = 0"] + [f"[S{i}]\nx = ${{S{i - 1}:x}}" for i in range(1, 50)]
+        )
+        conf = TOMLParser.from_string(text)
+        self.assertEqual("0", conf.literals["S49"]["x"])
+        self.assertEqual(50, len(conf.graph.values))
+
+    def test_cycle(self):
+        text = """
+        [A]
+        x = ${B:y}
+        [B]
+        y = ${C:z}
+        [C]
+        z = ${A:x}
+        [D]
+        safe = 1
+        """
+        conf = TOMLParser.from_string(text)
+        with self.assertRaises(InterpolationCycleError) as context:
+            conf.table("D")
+
+        self.assertEqual(4, len(context.exception.path))
+        self.assertEqual(context.exception.path[0], context.exception.path[-1])
+        self.assertIn("A:x -> B:y", str(context.exception))
+        self.assertIsInstance(context.exception, configparser.InterpolationError)
+
+    def test_self_reference(self):
+        conf = TOMLParser.from_string("[A]\nx = ${x}")
+        self.assertRaises(InterpolationCycleError, getattr, conf, "literals")
+
+    def test_default_placeholder(self):
+        # Every section must override the option, so DEFAULT itself never resolves
+        text = "[DEFAULT]\nport = ${port}\n[web]\nport = 80\n[api]\nport = 81\n"
+        conf = TOMLParser.from_string(text)
+        self.assertEqual({"web": {"port": 80}, "api": {"port": 81}}, dict(conf.tables))
+        self.assertRaises(InterpolationCycleError, conf.graph.value, "DEFAULT", "port")
+
+        conf.add_section("db")
+        self.assertRaises(InterpolationCycleError, dict, conf.tables)
+        conf.set("db", "port", "5432")
+        self.assertEqual(5432, conf.tables["db"]["port"])
+
+    def test_other_interpolation(self):
+        text = """
+        [A]
+        x = 1
+        y = %(x)s
+        """
+        conf = TOMLParser.from_string(text, interpolation=configparser.BasicInterpolation())
+        self.assertFalse(conf.graph.compiled)
+        self.assertEqual({"A": {"x": 1, "y": 1}}, dict(conf.tables))
+
+
+class TestIncremental(unittest.TestCase):
+
+    text = """
+    [DEFAULT]
+    port = 80
+    url = "localhost:${port}/${DB:port}"
+    [DB]
+    port = 5432
+    user = "postgres"
+    [APP]
+    db = ${DB:user}
+    label = ${DB:port}
+    [APP.cache]
+    size = 2
+    [LOG]
+    level = "INFO"
+    """
+
+    @staticmethod
+    def fresh(conf):
+        rv = TOMLParser()
+        rv.read_dict({conf.default_section: conf.defaults()})
+        rv.read_dict({k: dict(v) for k, v in conf._sections.items()})
+        return rv
+
+    def test_only_dependents_discarded(self):
+        conf = TOMLParser.from_string(self.text)
+        dict(conf.tables)
+        log = conf.tables.table(("LOG",))
+        conf.set("DB", "user", '"admin"')
+        self.assertIs(log, conf.tables.table(("LOG",)))
+        self.assertNotIn(("APP", "db"), conf.graph.values)
+        self.assertIn(("DB", "port"), conf.graph.values)
+        self.assertEqual("admin", conf.tables["APP"]["db"])
+
+    def test_default_discards_inheritors(self):
+        conf = TOMLParser.from_string(self.text)
+        dict(conf.tables)
+        conf.set("DEFAULT", "port", "8080")
+        self.assertEqual("localhost:8080/5432", conf.tables["LOG"]["url"])
+        self.assertEqual(8080, conf.tables["APP"]["cache"]["port"])
+        self.assertEqual("localhost:5432/5432", conf.tables["DB"]["url"])
+
+    def test_unchanged_value(self):
+        conf = TOMLParser.from_string(self.text)
+        generation = conf.generation
+        conf.set("DB", "port", "5432")
+        self.assertEqual(generation, conf.generation)
+
+    def test_parity(self):
+        edits = [
+            ("DB", "port", "6543"),
+            ("APP", "label", "${LOG:level}"),
+            ("DB", "db", '"name"'),
+            ("APP", "label", "${DB:db}"),
+            ("DB", "db", '"other"'),
+            ("LOG", "port", "443"),
+            ("DEFAULT", "port", "8080"),
+            ("DEFAULT", "url", "${LOG:level}"),
+            ("DEFAULT", "url", '"localhost:${port}"'),
+            ("LOG", "port", None),
+            ("DEFAULT", "extra", "1"),
+            ("APP.cache", "size", "${DB:port}"),
+            ("APP.cache", "label", "${LOG:port}"),
+            ("DB", "port", None),
+            ("DB", "port", "1"),
+        ]
+        conf = TOMLParser.from_string(self.text)
+        for n, (section, option, value) in enumerate(edits):
+            with self.subTest(n=n):
+                dict(conf.tables)
+                if value is None:
+                    conf.remove_option(section, option)
+                else:
+                    conf.set(section, option, value)
+                expected = self.fresh(conf)
+                self.assertEqual(expected.literals, conf.literals)
+                self.assertEqual(dict(expected.tables), dict(conf.tables))
+
+    def test_cycle_introduced(self):
+        conf = TOMLParser.from_string(self.text)
+        dict(conf.tables)
+        conf.set("DB", "port", "${APP:label}")
+        self.assertRaises(InterpolationCycleError, dict, conf.tables)
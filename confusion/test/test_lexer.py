@@ -0,0 +1,173 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import configparser
+import io
+import textwrap
+import unittest
+from unittest.mock import patch
+
+from confusion.bench.data import config
+from confusion.bench.data import graph
+from confusion.lexer import Lexer
+from confusion.parser import TOMLParser
+
+
+@unittest.skipUnless(Lexer.supports(TOMLParser()), "configparser lacks the internals of the lexer")
+class TestLexer(unittest.TestCase):
+
+    examples = [
+        """
+        [A]
+        a = 1
+        b: 2
+        c = "x:y"
+        d : "a=b"
+        e=f
+        """,
+        '''
+        [DEFAULT]
+        flake = false
+
+        [A]
+        text = """
+            Code is like
+
+            Poetry.
+            # Not an option
+            """
+        after = 1
+          [not a header]
+        ''',
+        """
+        # Comment
+        ; Another
+        [A.B]   # trailing
+        key = value   ; kept
+            continued
+        \tand tabbed
+
+        [ spaced ]
+        x = 1
+        """,
+        """
+        [A]
+        a = 1
+        [B]
+        b = 2
+        [A]
+        c = 3
+        """,
+        """
+        [A]
+        a = 1
+        a = 2
+        """,
+        """
+        a = 1
+        [A]
+        """,
+        """
+        [A]
+        no delimiter here
+            continued
+        = empty name
+        b = 2
+        """,
+        """
+        [A]
+        a = [
+            1,
+
+            2,
+        ]
+        """,
+    ]
+
+    @staticmethod
+    def store(text, lexer=True, **kwargs):
+        with patch.object(Lexer, "supports", return_value=lexer):
+            parser = TOMLParser(**kwargs)
+            try:
+                parser.read_string(textwrap.dedent(text), source="<test>")
+            except configparser.Error as e:
+                return type(e), str(e)
+        return (
+            dict(parser._defaults),
+            {k: dict(v) for k, v in parser._sections.items()},
+            list(parser._proxies),
+        )
+
+    def test_parity(self):
+        for options in (
+            {}, {"strict": False}, {"empty_lines_in_values": False},
+            {"comment_prefixes": ("//",)},
+        ):
+            for text in self.examples:
+                with self.subTest(options=options, text=text):
+                    self.assertEqual(
+                        self.store(text, lexer=False, **options),
+                        self.store(text, lexer=True, **options),
+                    )
+
+    def test_generated(self):
+        for text in (config(200, 8, 3, 4), graph(500)):
+            self.assertEqual(self.store(text, lexer=False), self.store(text))
+
+    def test_supports(self):
+        self.assertTrue(Lexer.supports(TOMLParser()))
+        self.assertFalse(Lexer.supports(TOMLParser(delimiters=("=",))))
+        self.assertFalse(Lexer.supports(TOMLParser(inline_comment_prefixes=("#",))))
+        self.assertFalse(Lexer.supports(TOMLParser(allow_no_value=True)))
+
+    def test_multiple_files(self):
+        parser = TOMLParser()
+        parser.read_file(io.StringIO("[A]\na = 1\n"))
+        parser.read_file(io.StringIO("[A]\nb = 2\n    more\n[B]\n"))
+        self.assertEqual({"a": "1", "b": "2\nmore"}, dict(parser._sections["A"]))
+        self.assertEqual(["A", "B"], list(parser.sections))
+
+
+class TestFallback(unittest.TestCase):
+
+    class Parser(TOMLParser):
+
+        @property
+        def _handle_error(self):
+            raise AttributeError("_handle_error")
+
+    def test_missing_internals(self):
+        parser = self.Parser()
+        self.assertFalse(Lexer.supports(parser))
+        with patch.object(Lexer, "read", side_effect=AssertionError) as read:
+            parser.read_string("[A]\na = 1\nb = [\n    2,\n    ]\n[B]\nc = ${A:a}\n")
+        read.assert_not_called()
+        self.assertEqual({"a": 1, "b": [2]}, parser.tables["A"])
+        self.assertEqual(1, parser.tables["B"]["c"])
+
+    def test_read_fallback(self):
+        text = config(20, 4, 2, 2)
+        expected = TOMLParser()
+        expected.read_string(text)
+        with patch.object(Lexer, "supports", return_value=False):
+            parser = TOMLParser()
+            with patch.object(Lexer, "read", side_effect=AssertionError):
+                parser.read_string(text)
+        self.assertEqual(dict(expected.tables), dict(parser.tables))
@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import configparser
+import pathlib
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import patch
+
+from confusion.bench.data import config
+from confusion.config import Config
+from confusion.lexer import Lexer
+from confusion.overlay import Overlay
+from confusion.overlay import OverlayGraph
+
+
+class TestOverlay(unittest.TestCase):
+
+    base_text = textwrap.dedent("""
+    [DEFAULT]
+    root = "/srv"
+    here = ${name}
+
+    [A]
+    name = "alpha"
+    path = ${root}
+
+    [B]
+    name = "beta"
+    ref = ${A:name}
+    size = 3
+
+    [C]
+    name = "gamma"
+    x = 1
+
+    [C.D]
+    name = "delta"
+    y = ${C:x}
+    """)
+
+    def setUp(self):
+        self.base = Config.from_string(self.base_text)
+        self.tables = dict(self.base.tables)
+
+    def tearDown(self):
+        self.assertEqual(self.tables, dict(self.base.tables))
+
+    def assertShared(self, base, overlay, name):
+        self.assertEqual(base.tables[name], overlay.tables[name])
+        self.assertIsNot(base.tables[name], overlay.tables[name])
+        self.assertNotIn(name, overlay.tables.roots)
+
+    def check(self, overlay, text):
+        expected = Config.from_string(self.base_text)
+        expected.read_string(textwrap.dedent(text))
+        self.assertEqual(list(expected.sections), list(overlay.sections))
+        self.assertEqual(dict(expected.tables), dict(overlay.tables))
+        self.assertEqual(expected.write_string(), overlay.write_string())
+
+    def test_empty(self):
+        overlay = Overlay(self.base)
+        self.assertIsInstance(overlay.graph, OverlayGraph)
+        self.assertEqual(self.tables, dict(overlay.tables))
+        for name in self.tables:
+            self.assertShared(self.base, overlay, name)
+        self.assertFalse(overlay.graph.values.own)
+        self.assertFalse(overlay._sections.own)
+
+    def test_override(self):
+        text = """
+        [A]
+        name = "tenant"
+        """
+        overlay = Overlay(self.base)
+        overlay.read_string(textwrap.dedent(text))
+        self.check(overlay, text)
+        self.assertEqual("tenant", overlay.tables["B"]["ref"])
+        self.assertShared(self.base, overlay, "C")
+        self.assertEqual({"A"}, set(overlay._sections.own))
+        self.assertEqual(
+            {("A", "name"), ("A", "here"), ("B", "ref")},
+            set(overlay.graph.values.own)
+        )
+
+    def test_override_without_lexer(self):
+        # configparser's reader writes back every option of the sections it joins
+        with patch.object(Lexer, "supports", return_value=False):
+            self.test_override()
+
+    def test_default_override(self):
+        text = """
+        [DEFAULT]
+        root = "/tenant"
+        """
+        overlay = Overlay(self.base)
+        overlay.read_string(textwrap.dedent(text))
+        self.assertIsInstance(overlay.graph, OverlayGraph)
+        self.check(overlay, text)
+        self.assertEqual("/tenant", overlay.tables["A"]["path"])
+
+    def test_new_default(self):
+        text = """
+        [DEFAULT]
+        extra = 1
+        """
+        overlay = Overlay(self.base)
+        overlay.read_string(textwrap.dedent(text))
+        self.assertNotIsInstance(overlay.graph, OverlayGraph)
+        self.check(overlay, text)
+
+    def test_new_sections(self):
+        text = """
+        [C.E]
+        name = "epsilon"
+        z = ${B:size}
+
+        [F]
+        name = "phi"
+        """
+        overlay = Overlay(self.base)
+        overlay.read_string(textwrap.dedent(text))
+        self.check(overlay, text)
+        self.assertShared(self.base, overlay, "A")
+        self.assertEqual(3, overlay.tables["C"]["E"]["z"])
+
+    def test_merge(self):
+        overlay = Overlay(self.base).merge({"C_x": 5})
+        self.assertEqual(5, overlay.tables["C"]["D"]["y"])
+        self.assertShared(self.base, overlay, "B")
+        self.check(overlay, "[C]\nx = 5\n")
+
+    def test_remove(self):
+        overlay = Overlay(self.base)
+        overlay.remove_option("B", "size")
+        self.assertNotIn("size", overlay.tables["B"])
+        overlay.remove_section("A")
+        self.assertEqual(["B", "C"], list(overlay.tables))
+        with self.assertRaises(configparser.InterpolationMissingOptionError):
+            overlay.tables["B"]
+        self.assertIn("size", self.base["B"])
+        self.assertIn("A", self.base)
+
+    def test_replace_section(self):
+        overlay = Overlay(self.base)
+        overlay["B"] = {"name": '"new"'}
+        self.assertEqual({"name": "new", "root": "/srv", "here": "new"}, overlay.tables["B"])
+        self.assertEqual(["A", "B", "C", "C.D"], list(overlay.sections))
+        self.assertShared(self.base, overlay, "C")
+
+    def test_shared_tables_copied(self):
+        base = Config.from_string("[DB]\nopts = [1, 2]\n")
+        tenants = [Overlay(base), Overlay(base)]
+        tenants[0].tables["DB"]["opts"].append(99)
+        tenants[0].tables["DB"]["x"] = 1
+        self.assertEqual([1, 2], base.tables["DB"]["opts"])
+        self.assertEqual({"opts": [1, 2]}, tenants[1].tables["DB"])
+        self.assertEqual({"opts": [1, 2, 99], "x": 1}, tenants[0].tables["DB"])
+        self.assertIs(tenants[0].tables["DB"], tenants[0].tables["DB"])
+        self.assertIs(tenants[0].tables["DB"]["opts"], tenants[0].table("DB.opts"))
+
+    def test_base_modified(self):
+        base = Config.from_string(self.base_text)
+        overlay = Overlay(base)
+        overlay.read_string('[A]\nname = "tenant"\n')
+        self.assertEqual("/srv", overlay.tables["A"]["path"])
+        self.assertEqual("/srv", overlay.tables["C"]["root"])
+        generation = overlay.generation
+
+        base.set("DEFAULT", "root", '"/opt"')
+        base.set("C", "x", "2")
+        self.assertEqual("/opt", overlay.tables["A"]["path"])
+        self.assertEqual("/opt", overlay.tables["C"]["root"])
+        self.assertEqual(2, overlay.tables["C"]["D"]["y"])
+        self.assertEqual("tenant", overlay.tables["B"]["ref"])
+        self.assertLess(generation, overlay.generation)
+
+    def test_new_section_shares_default(self):
+        text = '[DEFAULT]\nurl = "http://localhost:${port}"\nport = 80\n[web]\nport = 8080\n'
+        base = Config.from_string(text)
+        expected = Config.from_string(text + '[api]\nname = "api"\n')
+
+        overlay = Overlay(base)
+        overlay.read_string('[api]\nname = "api"\n')
+        self.assertEqual(dict(expected.tables), dict(overlay.tables))
+
+        overlay = Overlay(base)
+        overlay.add_section("api")
+        self.assertEqual({"url": "http://localhost:80", "port": 80}, overlay.tables["api"])
+
+    def test_from_path(self):
+        with tempfile.TemporaryDirectory() as parent:
+            path = pathlib.Path(parent, "tenant.cfn")
+            path.write_text('[B]\nsize = 4\n')
+            overlay = Overlay.from_path(path, base=self.base, cache=pathlib.Path(parent, "cache"))
+            self.assertEqual(path, overlay.path)
+            self.assertEqual(4, overlay.tables["B"]["size"])
+
+    def test_growth(self):
+        base = Config.from_string(config(500, 8, 3, 3))
+        dict(base.tables)
+        for section in base.sections:
+            dict(base.literals[section])
+
+        overlays = {i: Overlay(base).merge({f"S{i}_int_0": -i}) for i in range(1, 20) if i % 10}
+        for i, overlay in overlays.items():
+            self.assertEqual(-i, overlay.tables[f"S{i}"]["int_0"])
+            self.assertShared(base, overlay, "S401")
+            self.assertLess(len(overlay.graph.values.own), 50)
+            self.assertEqual(1, len(overlay._sections.own))
@@ -18,6 +18,10 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 # USA
 
+import configparser
+import pathlib
+import tempfile
+import textwrap
 import unittest
 
 from confusion.parser import TOMLParser
@@ -101,6 +105,70 @@ class TestParser(unittest.TestCase):
         conf = TOMLParser.from_string(text)
         self.assertIsInstance(conf, TOMLParser)
 
+    def test_from_file(self):
+        text = textwrap.dedent("""
+        [A]
+        flavour = "strawberry"
+        [B]
+        flavour = ${A:flavour}
+        """)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp, "test.cfn")
+            path.write_text(text)
+            conf = TOMLParser.from_file(path)
+            self.assertEqual(TOMLParser.from_string(text).tables, dict(conf.tables))
+
+            path.write_text("[A]\n[A]")
+            with self.assertRaises(configparser.DuplicateSectionError) as context:
+                TOMLParser.from_file(path)
+            self.assertEqual(str(path), context.exception.source)
+
+    def test_read_parallel(self):
+        texts = [
+            "[DEFAULT]\nflake = false\n[A]\nflavour = \"strawberry\"\n[B]\nsize = 1",
+            "[B]\nsize = 2\nflavour = ${A:flavour}\n[C]",
+            "[DEFAULT]\nflake = true\n[A]\nflavour = \"vanilla\"",
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [pathlib.Path(tmp, f"{n}.cfn") for n in range(len(texts))]
+            for path, text in zip(paths, texts):
+                path.write_text(text)
+            paths.insert(1, pathlib.Path(tmp, "missing.cfn"))
+
+            expected = TOMLParser()
+            self.assertEqual([str(i) for i in paths if i.exists()], expected.read(paths))
+            for workers in (1, 2):
+                with self.subTest(workers=workers):
+                    conf = TOMLParser()
+                    rv = conf.read_parallel(paths, workers=workers)
+                    self.assertEqual([str(i) for i in paths if i.exists()], list(rv))
+                    self.assertTrue(all(isinstance(i, float) for i in rv.values()))
+                    self.assertEqual(list(expected.sections), list(conf.sections))
+                    self.assertEqual(dict(expected.tables), dict(conf.tables))
+                    self.assertEqual("vanilla", conf.tables["B"]["flavour"])
+
+            paths[0].write_text("[A]\n[A]")
+            self.assertRaises(configparser.DuplicateSectionError, TOMLParser().read_parallel, paths, workers=2)
+
+            conf = TOMLParser(strict=False, comment_prefixes=("//",))
+            paths[0].write_text("[A]\n// a comment\n[A]\nflavour = \"lime\"")
+            conf.read_parallel(paths[:2], workers=2)
+            self.assertEqual("lime", conf.tables["A"]["flavour"])
+
+            paths[0].write_text("[A]\nflag\n")
+            for args in [(), (None, dict, True)]:
+                with self.subTest(args=args):
+                    expected = TOMLParser(*args)
+                    conf = TOMLParser(*args)
+                    try:
+                        expected.read(paths[:1])
+                    except configparser.ParsingError as e:
+                        self.assertRaises(type(e), conf.read_parallel, paths[:1], workers=2)
+                    else:
+                        conf.read_parallel(paths[:1], workers=2)
+                        self.assertEqual(dict(expected["A"]), dict(conf["A"]))
+                        self.assertTrue(conf._allow_no_value)
+
     def test_literals(self):
         text = """
         [DEFAULT]
@@ -184,3 +252,111 @@ class TestParser(unittest.TestCase):
             },
             conf.tables
         )
+
+
+class TestTablesCache(unittest.TestCase):
+
+    text = """
+    [DEFAULT]
+    flake = false
+    [A]
+    flavour = "strawberry"
+    [B]
+    flavour = ${A:flavour}
+    """
+
+    def test_tables_cached(self):
+        conf = TOMLParser.from_string(self.text)
+        generation = conf.generation
+        self.assertIs(conf.tables, conf.tables)
+        self.assertEqual(generation, conf.generation)
+
+    def test_set_invalidates(self):
+        conf = TOMLParser.from_string(self.text)
+        tables = conf.tables
+        generation = conf.generation
+        conf.set("A", "flavour", '"vanilla"')
+        self.assertGreater(conf.generation, generation)
+        self.assertIsNot(tables, conf.tables)
+        self.assertEqual("vanilla", conf.tables["B"]["flavour"])
+
+    def test_held_view_follows(self):
+        conf = TOMLParser.from_string(self.text)
+        tables = conf.tables
+        self.assertEqual(["A", "B"], list(tables))
+        conf.remove_section("A")
+        conf.set("B", "flavour", '"vanilla"')
+        self.assertEqual({"B": {"flake": False, "flavour": "vanilla"}}, dict(tables))
+        conf.add_section("C")
+        self.assertEqual(["B", "C"], list(tables))
+        self.assertEqual(2, len(tables))
+        self.assertIn("C", tables)
+        self.assertNotIn("A", tables)
+
+    def test_setitem_invalidates(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertEqual("strawberry", conf.tables["A"]["flavour"])
+        conf["A"]["flavour"] = '"banana"'
+        self.assertEqual("banana", conf.tables["B"]["flavour"])
+        conf["A"] = {"flavour": '"kiwi"'}
+        self.assertEqual({"flavour": "kiwi", "flake": False}, conf.tables["B"])
+
+    def test_remove_invalidates(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertIn("flake", conf.tables["A"])
+        conf.remove_option("DEFAULT", "flake")
+        self.assertNotIn("flake", conf.tables["A"])
+        conf.remove_option("B", "flavour")
+        conf.remove_section("A")
+        self.assertEqual({"B": {}}, conf.tables)
+
+    def test_sections_view(self):
+        conf = TOMLParser.from_string(self.text)
+        sections = conf.sections
+        self.assertEqual(["A", "B"], list(sections))
+        self.assertEqual(2, len(sections))
+        self.assertNotIn("DEFAULT", sections)
+        with self.assertRaises(KeyError):
+            sections["DEFAULT"]
+        conf.add_section("C")
+        self.assertEqual(["A", "B", "C"], list(sections))
+        self.assertIs(conf["C"], sections["C"])
+
+    def test_add_section_incremental(self):
+        conf = TOMLParser.from_string(self.text + "\n[C]\nflavour = ${D:flavour}\n")
+        graph = conf.graph
+        b = conf.tables["B"]
+        conf.add_section("A.B")
+        conf.add_section("D")
+        self.assertIs(graph, conf.graph)
+        self.assertIs(b, conf.tables["B"])
+        self.assertEqual(["A", "B", "C", "D"], list(conf.tables))
+        self.assertEqual({"flake": False}, conf.tables["A"]["B"])
+        conf.set("D", "flavour", '"lime"')
+        self.assertEqual("lime", conf.tables["C"]["flavour"])
+
+    def test_remove_section_incremental(self):
+        conf = TOMLParser.from_string(self.text + "\n[C]\n[A.C]\n")
+        graph = conf.graph
+        self.assertEqual(["A", "B", "C"], list(conf.tables))
+        c = conf.tables["C"]
+        conf.remove_section("A.C")
+        self.assertIs(graph, conf.graph)
+        self.assertIs(c, conf.tables["C"])
+        self.assertNotIn("C", conf.tables["A"])
+        conf.remove_section("A")
+        self.assertEqual(["B", "C"], list(conf.tables))
+        with self.assertRaises(configparser.InterpolationMissingOptionError):
+            conf.tables["B"]
+
+    def test_remove_section_order(self):
+        conf = TOMLParser.from_string("[A]\n[B]\n[A.C]\n")
+        self.assertEqual(["A", "B"], list(conf.tables))
+        conf.remove_section("A")
+        self.assertEqual(["B", "A"], list(conf.tables))
+
+    def test_read_invalidates(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertNotIn("C", conf.tables)
+        conf.read_string("[C]\nflake = true")
+        self.assertEqual({"flake": True}, conf.tables["C"])
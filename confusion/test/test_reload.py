@@ -0,0 +1,212 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import asyncio
+import configparser
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from confusion.reload import Reloader
+
+
+class Files:
+
+    text = '[DEFAULT]\nroot = "/srv"\n[A]\nname = "alpha"\npath = ${root}\n[B]\nsize = 1\n'
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.dir.name, "app.cfn")
+        self.path.write_text(self.text)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def touch(self, text=None):
+        if text is not None:
+            self.path.write_text(text)
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+
+class TestReloader(Files, unittest.TestCase):
+
+    def test_unchanged(self):
+        reloader = Reloader(self.path, debounce=0)
+        config = reloader.config
+        self.assertIsNone(reloader.check())
+        self.touch()
+        with mock.patch.object(reloader.cls, "from_path") as from_path:
+            self.assertIsNone(reloader.check())
+        from_path.assert_not_called()
+        self.assertIs(config, reloader.config)
+
+    def test_changes(self):
+        reloader = Reloader(self.path, debounce=0)
+        config = reloader.config
+        self.touch(self.text.replace('"/srv"', '"/opt"') + "[C]\n")
+        rv = reloader.check()
+        self.assertEqual({("A", "root"), ("A", "path"), ("B", "root"), ("C", None)}, rv)
+        self.assertIsNot(config, reloader.config)
+        self.assertEqual("/opt", reloader.config.tables["A"]["path"])
+        self.assertEqual("/srv", config.tables["A"]["path"])
+
+    def test_merge_reapplied(self):
+        reloader = Reloader(self.path, debounce=0).merge({"B_size": 5})
+        self.assertEqual(5, reloader.config.tables["B"]["size"])
+        self.touch(self.text.replace('"alpha"', '"beta"'))
+        self.assertEqual({("A", "name")}, reloader.check())
+        self.assertEqual(5, reloader.config.tables["B"]["size"])
+        self.assertEqual("beta", reloader.config.tables["A"]["name"])
+
+    def test_subscribers(self):
+        reloader = Reloader(self.path, debounce=0)
+        calls = []
+        callback = reloader.subscribe(lambda config, changes: calls.append((config, changes)))
+        self.touch(self.text.replace("size = 1", "size = 2"))
+        reloader.check()
+        self.assertEqual([(reloader.config, {("B", "size")})], calls)
+        reloader.unsubscribe(callback)
+        self.touch(self.text)
+        reloader.check()
+        self.assertEqual(1, len(calls))
+
+    def test_error_keeps_config(self):
+        reloader = Reloader(self.path, debounce=0)
+        config = reloader.config
+        self.touch(self.text + "[C]\nbad = ${A:missing}\n")
+        self.assertIsNone(reloader.check())
+        self.assertIs(config, reloader.config)
+        self.assertIsInstance(reloader.error, configparser.InterpolationError)
+
+        self.touch(self.text + "[C]\n")
+        self.assertEqual({("C", None)}, reloader.check())
+        self.assertIsNone(reloader.error)
+
+    def test_undecodable(self):
+        reloader = Reloader(self.path, debounce=0, encoding="utf-8")
+        config = reloader.config
+        # A file cut short in the middle of a character
+        self.path.write_bytes(self.text.replace("size = 1", 'size = "\u00e9"').encode("utf-8")[:-3])
+        self.touch()
+        self.assertIsNone(reloader.check())
+        self.assertIs(config, reloader.config)
+        self.assertIsInstance(reloader.error, UnicodeDecodeError)
+
+        self.touch(self.text.replace("size = 1", "size = 2"))
+        self.assertEqual({("B", "size")}, reloader.check())
+        self.assertIsNone(reloader.error)
+
+    def test_debounce(self):
+        reloader = Reloader(self.path, debounce=0.5)
+        self.touch(self.text.replace("size = 1", "size = 2"))
+        self.assertIsNone(reloader.check(now=10.0))
+        self.touch(self.text.replace("size = 1", "size = 3"))
+        self.assertIsNone(reloader.check(now=10.3))
+        self.assertIsNone(reloader.check(now=10.6))
+        self.assertEqual({("B", "size")}, reloader.check(now=10.9))
+        self.assertEqual(3, reloader.config.tables["B"]["size"])
+
+    def test_snapshot_published(self):
+        reloader = Reloader(self.path, debounce=0)
+        reloader.config.snapshot()
+        self.touch(self.text.replace("size = 1", "size = 2"))
+        reloader.check()
+        self.assertIsNotNone(reloader.config._snapshot)
+        self.assertEqual(2, reloader.config.current["B"]["size"])
+
+    def test_thread(self):
+        reloader = Reloader(self.path, debounce=0)
+        changed = mock.Mock()
+        reloader.subscribe(changed)
+        reloader.start(interval=0.01)
+        try:
+            self.touch(self.text.replace("size = 1", "size = 2"))
+            for n in range(200):
+                if changed.called:
+                    break
+                time.sleep(0.01)
+        finally:
+            reloader.stop()
+        changed.assert_called_once_with(reloader.config, {("B", "size")})
+
+    def test_thread_survives_error(self):
+        reloader = Reloader(self.path, debounce=0)
+        changed = mock.Mock()
+        reloader.subscribe(changed)
+        check = reloader.check
+        error = RuntimeError("check failed")
+        calls = iter([error])
+
+        def flaky(now=None):
+            for e in calls:
+                raise e
+            return check(now)
+
+        with mock.patch.object(reloader, "check", side_effect=flaky):
+            reloader.start(interval=0.01)
+            try:
+                for n in range(200):
+                    if reloader.error is error:
+                        break
+                    time.sleep(0.01)
+                self.touch(self.text.replace("size = 1", "size = 2"))
+                for n in range(200):
+                    if changed.called:
+                        break
+                    time.sleep(0.01)
+            finally:
+                reloader.stop()
+        self.assertIsNone(reloader.error)
+        changed.assert_called_once_with(reloader.config, {("B", "size")})
+
+
+class TestUpdates(Files, unittest.IsolatedAsyncioTestCase):
+
+    async def test_updates(self):
+        reloader = Reloader(self.path, debounce=0)
+        updates = reloader.updates(interval=0.01)
+        self.touch(self.text.replace("size = 1", "size = 2"))
+        rv = await asyncio.wait_for(updates.__anext__(), timeout=5)
+        self.assertEqual({("B", "size")}, rv)
+        self.assertEqual(2, reloader.config.tables["B"]["size"])
+        await updates.aclose()
+
+    async def test_updates_survive_error(self):
+        reloader = Reloader(self.path, debounce=0)
+        check = reloader.check
+        error = RuntimeError("check failed")
+        calls = iter([error])
+
+        def flaky(now=None):
+            for e in calls:
+                raise e
+            return check(now)
+
+        with mock.patch.object(reloader, "check", side_effect=flaky):
+            updates = reloader.updates(interval=0.01)
+            self.touch(self.text.replace("size = 1", "size = 2"))
+            rv = await asyncio.wait_for(updates.__anext__(), timeout=5)
+            await updates.aclose()
+        self.assertEqual({("B", "size")}, rv)
+        self.assertIsNone(reloader.error)
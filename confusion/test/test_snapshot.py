@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import textwrap
+import threading
+import unittest
+
+from confusion.config import Config
+from confusion.snapshot import Snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+
+    text = textwrap.dedent("""
+    [A]
+    foo = "bar"
+    size = 1
+    copy = ${size}
+
+    [A.B]
+    items = [1, [2, 3]]
+    data = { x = 1 }
+    """)
+
+    def test_freeze(self):
+        rv = Snapshot.freeze({"a": [1, {"b": [2]}]})
+        self.assertEqual(rv, {"a": (1, {"b": (2,)})})
+        with self.assertRaises(TypeError):
+            rv["a"] = 2
+        with self.assertRaises(TypeError):
+            rv["a"][1]["b"] = 3
+
+    def test_read_only(self):
+        conf = Config.from_string(self.text)
+        rv = conf.snapshot()
+        self.assertIsInstance(rv, Snapshot)
+        self.assertEqual(rv["A"]["B"]["items"], (1, (2, 3)))
+        self.assertEqual(rv.literals["A"]["copy"], "1")
+        self.assertEqual(rv.generation, conf.generation)
+        with self.assertRaises(AttributeError):
+            rv.tables = {}
+        with self.assertRaises(AttributeError):
+            del rv.literals
+        with self.assertRaises(TypeError):
+            rv["A"]["foo"] = "baz"
+        with self.assertRaises(TypeError):
+            rv.literals["A"]["foo"] = "baz"
+
+    def test_independent(self):
+        conf = Config.from_string(self.text)
+        rv = conf.snapshot()
+        conf.tables["A"]["B"]["items"].append(4)
+        conf.set("A", "foo", '"baz"')
+        self.assertEqual(rv["A"]["foo"], "bar")
+        self.assertEqual(rv.literals["A"]["foo"], '"bar"')
+        self.assertEqual(rv["A"]["B"]["items"], (1, (2, 3)))
+
+    def test_current(self):
+        conf = Config.from_string(self.text)
+        rv = conf.current
+        self.assertIs(conf.current, rv)
+
+        conf.merge({"A_size": 2})
+        self.assertIsNot(conf.current, rv)
+        self.assertEqual(conf.current["A"]["copy"], 2)
+        self.assertEqual(rv["A"]["copy"], 1)
+        self.assertGreater(conf.current.generation, rv.generation)
+
+    def test_merge_without_snapshot(self):
+        conf = Config.from_string(self.text)
+        conf.merge({"A_size": 2})
+        self.assertIsNone(conf._snapshot)
+
+    def test_concurrent_readers(self):
+        conf = Config.from_string(self.text)
+        conf.snapshot()
+        faults = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                rv = conf.current
+                if rv["A"]["size"] != rv["A"]["copy"]:
+                    faults.append(rv.generation)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for t in readers:
+            t.start()
+        try:
+            for n in range(2, 50):
+                conf.merge({"A_size": n})
+        finally:
+            done.set()
+            for t in readers:
+                t.join()
+
+        self.assertFalse(faults)
+        self.assertEqual(conf.current["A"]["copy"], 49)
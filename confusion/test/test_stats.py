@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import logging
+import pathlib
+import tempfile
+import textwrap
+import unittest
+
+from confusion.config import Config
+from confusion.parser import tomllib
+from confusion.parser import TOMLParser
+from confusion.stats import Stats
+
+
+class TestStats(unittest.TestCase):
+
+    text = textwrap.dedent("""
+    [DEFAULT]
+    root = "/tmp"
+
+    [A]
+    path = ${root}
+    size = 3
+    flags = { a = [1, 2] }
+
+    [B]
+    path = ${A:path}
+    """)
+
+    def test_disabled(self):
+        p = TOMLParser.from_string(self.text)
+        self.assertIsNone(p.stats)
+        self.assertIsNone(p.graph.stats)
+        self.assertEqual(p.tables["B"]["path"], "/tmp")
+
+    def test_phases(self):
+        stats = Stats()
+        p = TOMLParser.from_string(self.text, stats=stats)
+        self.assertIs(p.stats, stats)
+        self.assertEqual(p.tables["B"]["path"], "/tmp")
+        self.assertEqual(p.tables["A"]["flags"], {"a": [1, 2]})
+        p.write_string()
+
+        report = stats.report()
+        self.assertEqual({"read", "compile", "tables", "write_string"}, set(report["timers"]))
+        self.assertTrue(all(v >= 0 for v in report["timers"].values()))
+        self.assertEqual(report["counters"]["read"], 1)
+        self.assertEqual(report["counters"]["interpolations"], 2)
+        self.assertEqual(report["counters"]["toml.parses"], 1)
+        self.assertIn("values", report["hit_rates"])
+        self.assertIn("literals", report["hit_rates"])
+
+    def test_hit_rates(self):
+        stats = Stats()
+        p = TOMLParser.from_string(self.text, stats=stats)
+        p.tables["A"]
+        p.tables["A"]
+        self.assertEqual(stats.counters["tables.misses"], 1)
+        self.assertEqual(stats.hit_rate("tables"), 0.5)
+        self.assertIsNone(stats.hit_rate("cache"))
+
+    def test_document_fallback(self):
+        stats = Stats()
+        p = TOMLParser.from_string("[A]\nb = bare\n", stats=stats)
+        with self.assertRaises(tomllib.TOMLDecodeError):
+            p.tables["A"]
+        self.assertEqual(stats.counters["toml.documents"], 1)
+        self.assertIn("toml", stats.timers)
+
+    def test_merge(self):
+        stats = Stats()
+        p = Config.from_string(self.text, stats=stats)
+        p.merge({"A_size": 4})
+        self.assertEqual(p.tables["A"]["size"], 4)
+        self.assertEqual(stats.counters["merge"], 1)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as parent:
+            path = pathlib.Path(parent, "conf.toml")
+            path.write_text(self.text)
+            cache = pathlib.Path(parent, "cache")
+            for n in range(3):
+                stats = Stats()
+                p = Config.from_path(path, cache=cache, stats=stats)
+                self.assertEqual(p.tables["B"]["path"], "/tmp")
+                self.assertEqual(stats.hit_rate("cache"), float(bool(n)))
+
+    def test_logging(self):
+        logger = logging.getLogger("confusion.test.stats")
+        stats = Stats(logger=logger)
+        with self.assertLogs(logger, level=logging.DEBUG) as cm:
+            TOMLParser.from_string(self.text, stats=stats)
+            stats.log()
+
+        phases = [getattr(i, "phase", None) for i in cm.records]
+        self.assertIn("read", phases)
+        self.assertEqual(cm.records[-1].levelno, logging.INFO)
+        self.assertEqual(cm.records[-1].stats["counters"]["read"], 1)
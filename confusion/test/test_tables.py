@@ -0,0 +1,279 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import configparser
+import unittest
+
+from confusion.parser import TOMLParser
+from confusion.tables import TableBuilder
+from confusion.tables import tomllib
+from confusion.tables import Unresolved
+
+
+class TestTableBuilder(unittest.TestCase):
+
+    def test_key_path_bare(self):
+        self.assertEqual(("A", "B", "C"), TableBuilder.key_path("A.B.C"))
+        self.assertEqual(("a-b_1",), TableBuilder.key_path("a-b_1"))
+
+    def test_key_path_quoted(self):
+        self.assertEqual(("A.B", "C"), TableBuilder.key_path('"A.B".C'))
+        self.assertRaises(Unresolved, TableBuilder.key_path, '"A')
+
+    def test_value_cache(self):
+        builder = TableBuilder()
+        self.assertEqual([1, 2], builder.value("[1, 2]"))
+        self.assertIn("[1, 2]", builder.values)
+        rv = builder.value("[1, 2]")
+        rv.append(3)
+        self.assertEqual([1, 2], builder.value("[1, 2]"))
+
+    def test_value_cache_bounded(self):
+        builder = TableBuilder(maxsize=3)
+        for n in range(5000):
+            builder.value(str(n))
+        self.assertEqual(["4997", "4998", "4999"], list(builder.values))
+
+        builder.value("4997")
+        builder.value("[1]")
+        self.assertEqual(["4999", "4997", "[1]"], list(builder.values))
+
+        conf = TOMLParser()
+        conf.read_string("[A]\nn = 0")
+        for n in range(5000):
+            conf.set("A", "n", str(n))
+            conf.tables["A"]
+        self.assertLessEqual(len(conf._builder.values), conf._builder.maxsize)
+
+    def test_literal_scanner(self):
+        builder = TableBuilder()
+        for text in [
+            "0", "-0", "+12", "01", "1_000", "1.5", "-0.0", "1e5", "1E-5", "1.",
+            '"a"', '"a\\"b"', "'c:\\x'", '"tab\there"', "true", "false", "True", "inf",
+        ]:
+            with self.subTest(text=text):
+                try:
+                    expected = repr(tomllib.loads(f"v = {text}")["v"])
+                except tomllib.TOMLDecodeError:
+                    self.assertRaises(Unresolved, builder.parse, text)
+                else:
+                    self.assertEqual(expected, repr(builder.parse(text)))
+
+    def test_value_spill(self):
+        builder = TableBuilder()
+        self.assertRaises(Unresolved, builder.value, "1\nw = 2")
+        self.assertRaises(Unresolved, builder.value, "")
+        self.assertRaises(Unresolved, builder.value, None)
+
+
+class TestParity(unittest.TestCase):
+
+    examples = [
+        """
+        [A]
+        [B]
+        """,
+        """
+        [DEFAULT]
+        flavour = "vanilla"
+        flake = false
+        [A]
+        flavour = "strawberry"
+        [B]
+        flavour = ${A:flavour}
+        """,
+        """
+        [A]
+        tag = 1
+
+        [A.B.C]
+        tag = 2
+
+        [  D ]
+        """,
+        """
+        [A.B.C]
+        tag = 2
+        [A]
+        tag = 1
+        [A.B]
+        """,
+        """
+        [A]
+        label = "day/night cycles"
+        [B]
+        color = {"r" = 0, "g" = 0, "b" = 0}
+        """,
+        '''
+        [A]
+        text = """
+            Code is like
+            Poetry.
+            """
+        raw = \'\'\'C:\\Users\'\'\'
+        ''',
+        """
+        [types]
+        int = 1
+        hex = 0xff
+        float = 1.0
+        exp = 5e+22
+        inf = -inf
+        bool = true
+        date = 1979-05-27
+        time = 07:32:00
+        local = 1979-05-27T07:32:00
+        offset = 1979-05-27T07:32:00-08:00
+        array = [1, "two", [3.0]]
+        nested = [{a = 1}, {b = [true]}]
+        comment = 7 # trailing comment
+        """,
+        """
+        [A]
+        x.y = 1
+        x.z = 2
+        """,
+        """
+        ["quoted.name"]
+        tag = 1
+        ['single'.B]
+        tag = 2
+        """,
+        """
+        [A]
+        B = 1
+        [A.B]
+        tag = 2
+        """,
+        """
+        [A.B]
+        tag = 2
+        [A]
+        B = 1
+        """,
+        """
+        [A]
+        x = {a = 1}
+        [A.x]
+        b = 2
+        """,
+        """
+        [A]
+        x.y = 1
+        [A.x]
+        z = 2
+        """,
+        """
+        [A]
+        "A" = 1
+        [A.A]
+        """,
+        """
+        [A]
+        x = 1
+        [\"A\"]
+        y = 2
+        """,
+        """
+        [A]
+        x = 1
+            y = 2
+        """,
+        """
+        [A]
+        x = "unterminated
+        """,
+        """
+        [A]
+        x =
+        """,
+        """
+        [A]
+        x = words without quotes
+        """,
+    ]
+
+    @staticmethod
+    def outcome(conf, fn):
+        try:
+            return repr(fn(conf))
+        except tomllib.TOMLDecodeError:
+            return tomllib.TOMLDecodeError
+
+    def test_parity(self):
+        for n, text in enumerate(self.examples):
+            with self.subTest(n=n):
+                conf = TOMLParser.from_string(text)
+                self.assertEqual(
+                    self.outcome(conf, lambda x: tomllib.loads(x.write_string())),
+                    self.outcome(conf, lambda x: x.tables),
+                )
+
+    def test_parity_large(self):
+        text = "\n".join(
+            f"[S{i:04d}.T{i % 7}]\na = {i}\nb = \"{i}\"\nc = [{i}, {i + 1}]\nd = ${{S{i // 2:04d}.T{(i // 2) % 7}:a}}"
+            for i in range(500)
+        )
+        conf = TOMLParser.from_string(text)
+        self.assertEqual(tomllib.loads(conf.write_string()), conf.tables)
+
+
+class TestLazyTables(unittest.TestCase):
+
+    text = """
+    [DEFAULT]
+    flake = false
+    [A]
+    flavour = "strawberry"
+    [A.B]
+    flavour = ${A:flavour}
+    [A.B.C]
+    size = 2
+    [D]
+    flavour = ${Z:missing}
+    """
+
+    def test_table(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertEqual({"flavour": "strawberry", "flake": False, "C": {"size": 2, "flake": False}}, conf.table("A.B"))
+        self.assertEqual({"size": 2, "flake": False}, conf.table("A.B.C"))
+        self.assertRaises(KeyError, conf.table, "A.X")
+        self.assertRaises(KeyError, conf.table, "A.flake.X")
+
+    def test_table_memoised(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertIs(conf.table("A.B"), conf.table("A.B"))
+        self.assertEqual(["A", "A.B", "A.B.C"], list(conf.tables.literals))
+
+    def test_unreferenced_section_untouched(self):
+        conf = TOMLParser.from_string(self.text)
+        self.assertEqual(["A", "D"], list(conf.tables))
+        self.assertEqual("strawberry", conf.tables["A"]["B"]["flavour"])
+        self.assertNotIn("D", conf.tables.literals)
+        with self.assertRaises(configparser.InterpolationMissingOptionError):
+            conf.tables["D"]
+
+    def test_mapping(self):
+        conf = TOMLParser.from_string(self.text)
+        conf.remove_section("D")
+        self.assertEqual(1, len(conf.tables))
+        self.assertIn("A", conf.tables)
+        self.assertNotIn("D", conf.tables)
+        self.assertEqual(tomllib.loads(conf.write_string()), dict(conf.tables))
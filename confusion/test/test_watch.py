@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+from confusion.watch import Watcher
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.paths = [pathlib.Path(self.dir.name, name) for name in ("a.cfn", "b.cfn")]
+        for path in self.paths:
+            path.write_text("[A]")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_changes(self):
+        watcher = Watcher(self.paths)
+        self.assertEqual([], watcher.changes())
+
+        self.paths[1].write_text("[A]\n[B]")
+        self.assertEqual(self.paths[1:], watcher.changes())
+        self.assertEqual([], watcher.changes())
+
+        stat = self.paths[0].stat()
+        os.utime(self.paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+        self.assertEqual(self.paths[:1], watcher.changes())
+
+    def test_missing(self):
+        watcher = Watcher(self.paths)
+        self.paths[0].unlink()
+        self.assertEqual(self.paths[:1], watcher.changes())
+        self.paths[0].write_text("[A]")
+        self.assertEqual(self.paths[:1], next(watcher.poll(interval=0)))
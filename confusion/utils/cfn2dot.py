@@ -32,15 +32,25 @@ Usage:
 
 import argparse
 from collections import namedtuple
-import dataclasses
+import configparser
+import contextlib
+import filecmp
 import fileinput
 import functools
+import gzip
+import io
+import itertools
+import os
 import pathlib
 import re
+import stat
 import sys
+import tempfile
 
 from confusion.parser import tomllib
 from confusion.parser import TOMLParser
+from confusion.tables import TableBuilder
+from confusion.watch import Watcher
 
 
 RGBA = namedtuple("RGBA", ["r", "g", "b", "a"], defaults=(255,))
@@ -51,22 +61,30 @@ Arc = namedtuple(
 )
 
 
-@dataclasses.dataclass(eq=False)
-class Node:
+BLACK = RGBA(0, 0, 0)
+
 
-    name: str
+class Node:
 
-    label: str = None
-    weight: float = 1.0
-    arcs: list[Arc] = dataclasses.field(default_factory=list)
-    data: dict = None
-    parent: object = None
-    color: RGBA = RGBA(0, 0, 0)
-    fill: RGBA = RGBA(0, 0, 0)
-    stroke: RGBA = RGBA(0, 0, 0)
+    __slots__ = ("name", "label", "weight", "arcs", "data", "parent", "color", "fill", "stroke")
+
+    def __init__(
+        self, name: str, label: str = None, weight: float = 1.0, arcs: tuple[Arc] = (),
+        data: dict = None, parent: str = None,
+        color: RGBA = BLACK, fill: RGBA = BLACK, stroke: RGBA = BLACK
+    ):
+        self.name = name
+        self.label = label or name
+        self.weight = weight
+        self.arcs = arcs
+        self.data = data
+        self.parent = parent
+        self.color = color
+        self.fill = fill
+        self.stroke = stroke
 
-    def __post_init__(self):
-        self.label = self.label or self.name
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name!r}, label={self.label!r}, parent={self.parent!r})"
 
     @property
     def rank(self):
@@ -80,14 +98,45 @@ class Model:
         data = tomllib.loads(text)
         return cls(text, data)
 
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def hex(colour, alpha=True):
+        if alpha:
+            return f"#{colour.r:02x}{colour.g:02x}{colour.b:02x}{colour.a:02x}"
+        else:
+            return f"#{colour.r:02x}{colour.g:02x}{colour.b:02x}"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def style(stroke, color, fill, alpha=(True, True, True)):
+        """Render the colour attributes of a node or arc."""
+        return (
+            f'color="{Model.hex(stroke, alpha[0])}"'
+            f' fontcolor="{Model.hex(color, alpha[1])}"'
+            f' fillcolor="{Model.hex(fill, alpha[2])}"'
+        )
+
     @staticmethod
     def is_arc(table):
         return set(table.keys()).intersection({"source", "target"})
 
-    def __init__(self, text, data, args=argparse.Namespace()):
+    @classmethod
+    def from_parser(cls, parser, **kwargs):
+        """
+        Build a model from the sections and typed tables of a parser, without text.
+
+        """
+        rv = cls(None, parser.tables, **kwargs)
+        rv.parser = parser
+        return rv
+
+    def __init__(self, text, data, args=argparse.Namespace(), keep_data=True):
         self.text = text
         self.data = data
         self.args = args
+        self.keep_data = keep_data
+        self.parser = None
+        self.palette = {BLACK: BLACK}
         self.table_finder = re.compile("\[\s*([\.\w]+)\s*\]")
 
     @property
@@ -107,73 +156,137 @@ class Model:
             else:
                 yield parent, k, v
 
-    @property
-    @functools.cache
-    def tables(self):
-        rv = {}
-        for path in self.table_finder.findall(self.text):
-            keys = path.split(".")
-            data = self.data
-            for k in keys:
-                data = data[k]
-            rv[path] = data
+    def rgba(self, table):
+        """Return a colour, shared with every other of the same value."""
+        rv = RGBA(**table)
+        return self.palette.setdefault(rv, rv)
+
+    def invalidate(self):
+        """Discard the tables, nodes and indexes derived from the data."""
+        for attr in ("tables", "nodes", "family", "ids"):
+            self.__dict__.pop(attr, None)
+        return self
+
+    def update(self, roots, text=None, data=None):
+        """
+        Take on new text or data, in which only the tables under `roots` have changed.
+
+        Nodes outside those roots are kept as they are.
+
+        """
+        tables, nodes = self.tables, self.nodes
+        self.invalidate()
+        self.text = text if text is not None else self.text
+        self.data = data if data is not None else self.data
+        self.tables = {
+            name: tables[name] if name in tables and self.root(name) not in roots else self.table(name)
+            for name in self.names()
+        }
+        self.nodes = self.build(
+            self.tables, {k: v for k, v in nodes.items() if self.root(k) not in roots}
+        )
+        return self
+
+    def names(self):
+        """Return the names of tables, in the order they are defined."""
+        if self.parser is None:
+            return self.table_finder.findall(self.text)
+        else:
+            return list(self.parser.sections)
+
+    @staticmethod
+    def root(name):
+        return TableBuilder.key_path(name)[0]
+
+    def table(self, name):
+        rv = self.data
+        for k in TableBuilder.key_path(name):
+            rv = rv[k]
         return rv
 
-    @property
-    @functools.cache
+    @functools.cached_property
+    def tables(self):
+        return {name: self.table(name) for name in self.names()}
+
+    @functools.cached_property
     def nodes(self):
+        return self.build(self.tables)
+
+    def build(self, tables, known={}):
+        """Create nodes for tables, reusing those in `known` along with their arcs."""
         rv = {}
         arcs = {}
-        fields = {i.name for i in dataclasses.fields(Node)}
-        for name, table in self.tables.items():
+        outgoing = {}
+        fields = set(Node.__slots__)
+        paths = {name: TableBuilder.key_path(name) for name in tables}
+        index = {path: name for name, path in paths.items()}
+        for name, table in tables.items():
+            if name in known:
+                rv[name] = known[name]
+                continue
+
             if self.is_arc(table):
                 arcs[name] = table
                 continue
 
-            colours = {attr: RGBA(**table[attr]) for attr in ("color", "fill", "stroke") if attr in table}
+            colours = {attr: self.rgba(table[attr]) for attr in ("color", "fill", "stroke") if attr in table}
             kwargs = dict({k: v for k, v in table.items() if k in fields}, **colours)
             node = Node(name, **kwargs)
-            node.data = table
-            if "." in name:
-                paths = name.split(".")
-                for gen in range(1, len(paths)):
-                    last = ".".join(paths[:-gen])
-                    if last in self.tables:
-                        node.parent = last
+            if self.keep_data:
+                node.data = table
+            path = paths[name]
+            for n in range(len(path) - 1, 0, -1):
+                if path[:n] in index:
+                    node.parent = index[path[:n]]
+                    break
 
             rv[name] = node
 
         for name, table in arcs.items():
-            parent, dot, label = name.rpartition(".")
-            kwargs = {attr: RGBA(**table[attr]) for attr in ("color", "fill", "stroke") if attr in table}
-            arc = Arc(
-                table.get("label", label),
-                node=parent or None,
-                target=table.get("target"),
-                weight=table.get("weight", 1.0),
-                **kwargs
-            )
+            path = paths[name]
+            parent = index.get(path[:-1], ".".join(path[:-1]))
+            if parent in known:
+                continue
+
             try:
-                rv[parent].arcs.append(arc)
-            except AttributeError:
-                print(
-                    "Arc '", name, "' expects a Node for '", parent, "'.",
-                    sep="", file=sys.stderr
-                )
+                owner = rv[parent]
             except KeyError:
                 print(
                     "No Node '", parent, "' for Arc '", name, "'.",
                     sep="", file=sys.stderr
                 )
+                continue
+
+            kwargs = {attr: self.rgba(table[attr]) for attr in ("color", "fill", "stroke") if attr in table}
+            arc = Arc(
+                table.get("label", path[-1]),
+                node=owner.name,
+                target=table.get("target"),
+                weight=table.get("weight", 1.0),
+                **kwargs
+            )
+            outgoing.setdefault(owner, []).append(arc)
 
+        for node, items in outgoing.items():
+            node.arcs = tuple(items)
         return rv
 
-    @functools.cache
+    @functools.cached_property
+    def family(self):
+        """An index from the name of each node to the names of its children."""
+        rv = {}
+        for name, node in self.nodes.items():
+            if node.parent is not None:
+                rv.setdefault(node.parent, []).append(name)
+        return rv
+
+    @functools.cached_property
+    def ids(self):
+        """Sequential DOT identifiers for nodes, in the order of their definition."""
+        return {name: n for n, name in enumerate(self.nodes)}
+
     def children(self, name):
-        return [
-            k for k, v in self.nodes.items()
-            if k != name and k.startswith(name)
-        ]
+        return self.family.get(name, [])
 
     def subgraphs(self, parents=None):
         parents = parents or [v for v in self.nodes.values() if not v.parent]
@@ -201,6 +314,7 @@ class Model:
     def to_cluster(self, name="model", label=None, directed=True, strict=True):
         label = label or name
         arc_style = "->" if directed else "--"
+        ids = self.ids
 
         yield f"{'strict ' if strict else ''}{'digraph' if directed else 'graph'} {name} {{"
         yield f'    label="{label}"'
@@ -216,33 +330,19 @@ class Model:
                 yield f"    weight={node.weight:.2f}"
                 yield ""
             else:
-                node_hash = hash(node)
-                yield (
-                    f"{node_hash}"
-                    f' ['
-                    f' label="{node.label}", weight={node.weight:.02f}'
-                    f' color="#{node.stroke.r:02x}{node.stroke.g:02x}{node.stroke.b:02x}{node.stroke.a:02x}"'
-                    f' fontcolor="#{node.color.r:02x}{node.color.g:02x}{node.color.b:02x}"'
-                    f' fillcolor="#{node.fill.r:02x}{node.fill.g:02x}{node.fill.b:02x}"'
-                    f' ]'
-                )
+                node_id = ids[node.name]
+                style = self.style(node.stroke, node.color, node.fill, alpha=(True, False, False))
+                yield f'{node_id} [ label="{node.label}", weight={node.weight:.02f} {style} ]'
 
 
         yield ""
 
         for node in self.nodes.values():
-            node_hash = hash(node)
+            node_id = ids[node.name]
             for arc in node.arcs:
-                target_hash = hash(self.nodes[arc.target])
-                yield (
-                    f"{node_hash} {arc_style} {target_hash}"
-                    f' ['
-                    f' label="{arc.label}", weight={arc.weight:.02f}'
-                    f' color="#{arc.stroke.r:02x}{arc.stroke.g:02x}{arc.stroke.b:02x}"'
-                    f' fontcolor="#{arc.color.r:02x}{arc.color.g:02x}{arc.color.b:02x}"'
-                    f' fillcolor="#{arc.fill.r:02x}{arc.fill.g:02x}{arc.fill.b:02x}"'
-                    f' ]'
-                )
+                target_id = ids[arc.target]
+                style = self.style(arc.stroke, arc.color, arc.fill, alpha=(False, False, False))
+                yield f'{node_id} {arc_style} {target_id} [ label="{arc.label}", weight={arc.weight:.02f} {style} ]'
         yield ""
         yield "}"
 
@@ -253,70 +353,251 @@ class Model:
         yield f'{"strict " if strict else ""}{"digraph" if directed else "graph"} "{label}" {{'
         yield ""
 
-        for node in self.nodes.values():
-            node_hash = hash(node)
-            yield (
-                f"{node_hash}"
-                f' ['
-                f' label="{node.label}", weight={node.weight:.02f}'
-                f' color="#{node.stroke.r:02x}{node.stroke.g:02x}{node.stroke.b:02x}{node.stroke.a:02x}"'
-                f' fontcolor="#{node.color.r:02x}{node.color.g:02x}{node.color.b:02x}{node.color.a:02x}"'
-                f' fillcolor="#{node.fill.r:02x}{node.fill.g:02x}{node.fill.b:02x}{node.fill.a:02x}"'
-                f' ]'
-            )
+        nodes = self.nodes
+        ids = self.ids
+        inherits = self.args.label_inherits
+        for node in nodes.values():
+            node_id = ids[node.name]
+            attrs = f"weight={node.weight:.02f} {self.style(node.stroke, node.color, node.fill)} ]"
+            yield f'{node_id} [ label="{node.label}", {attrs}'
 
-            ranks = sorted({self.nodes[i].rank for i in self.children(node.name)})
-            for child in [c for c in (self.nodes[i] for i in self.children(node.name)) if c.rank == ranks[0]]:
-                child_hash = hash(child)
-                yield (
-                    f"{node_hash} {arc_style} {child_hash}"
-                    f' ['
-                    f' label="{self.args.label_inherits}", weight={node.weight:.02f}'
-                    f' color="#{node.stroke.r:02x}{node.stroke.g:02x}{node.stroke.b:02x}{node.stroke.a:02x}"'
-                    f' fontcolor="#{node.color.r:02x}{node.color.g:02x}{node.color.b:02x}{node.color.a:02x}"'
-                    f' fillcolor="#{node.fill.r:02x}{node.fill.g:02x}{node.fill.b:02x}{node.fill.a:02x}"'
-                    f' ]'
-                )
+            children = [nodes[i] for i in self.children(node.name)]
+            rank = min((c.rank for c in children), default=None)
+            for child in [c for c in children if c.rank == rank]:
+                yield f'{node_id} {arc_style} {ids[child.name]} [ label="{inherits}", {attrs}'
 
 
             for arc in node.arcs:
-                target_hash = hash(self.nodes[arc.target])
-                yield (
-                    f"{node_hash} {arc_style} {target_hash}"
-                    f' ['
-                    f' label="{arc.label}", weight={arc.weight:.02f}'
-                    f' color="#{arc.stroke.r:02x}{arc.stroke.g:02x}{arc.stroke.b:02x}{arc.stroke.a:02x}"'
-                    f' fontcolor="#{arc.color.r:02x}{arc.color.g:02x}{arc.color.b:02x}{arc.color.a:02x}"'
-                    f' fillcolor="#{arc.fill.r:02x}{arc.fill.g:02x}{arc.fill.b:02x}{arc.fill.a:02x}"'
-                    f' ]'
-                )
+                target_id = ids[arc.target]
+                style = self.style(arc.stroke, arc.color, arc.fill)
+                yield f'{node_id} {arc_style} {target_id} [ label="{arc.label}", weight={arc.weight:.02f} {style} ]'
             yield ""
 
         yield ""
         yield "}"
 
 
+class Build:
+    """
+    Holds the parsed state of a set of input files, so that a change to one
+    of them can be applied without reading the others again.
+
+    """
+
+    @staticmethod
+    def fragment(path):
+        """Return the raw defaults and sections of a single file."""
+        rv = TOMLParser.fragment(path)
+        return rv[:2] if rv else ({}, {})
+
+    def __init__(self, paths, args=argparse.Namespace(), workers=1):
+        self.paths = list(paths)
+        self.args = args
+        self.fragments = {
+            path: fragment[:2] if fragment else ({}, {})
+            for path, fragment in zip(self.paths, TOMLParser().fragments(self.paths, workers=workers))
+        }
+        self.load()
+
+    def merge(self):
+        defaults, sections = {}, {}
+        for d, s in self.fragments.values():
+            defaults.update(d)
+            for name, options in s.items():
+                sections.setdefault(name, {}).update(options)
+        return defaults, sections
+
+    def load(self):
+        self.parser = TOMLParser().read_raw(*self.merge())
+        self.data = dict(self.parser.tables)
+        self.model = Model.from_parser(self.parser, args=self.args, keep_data=False)
+        return self
+
+    def patch(self, defaults, sections, names):
+        """
+        Apply new values to those sections named. Returns False if the order of
+        sections or options has changed, since the parser cannot follow that.
+
+        """
+        parser = self.parser
+        kept = [k for k in parser._sections if k in sections]
+        added = [k for k in sections if k not in parser._sections]
+        if kept + added != list(sections):
+            return False
+
+        with parser.batch():
+            for name in names:
+                if name not in sections and name in parser._sections:
+                    parser.remove_section(name)
+            for name in added:
+                parser.add_section(name)
+
+            targets = [(parser.default_section, defaults, parser._defaults)] + [
+                (name, sections[name], parser._sections[name]) for name in names if name in sections
+            ]
+            for name, target, own in targets:
+                for option in [k for k in own if k not in target]:
+                    parser.remove_option(name, option)
+                for option, value in target.items():
+                    parser.set(name, option, value)
+                if list(own) != list(target):
+                    return False
+        return True
+
+    def update(self, paths):
+        """
+        Read changed files again and apply their differences to the model.
+
+        Returns the roots of the tables which changed, or None if the model was rebuilt.
+
+        """
+        fragments = {path: self.fragment(path) for path in paths}
+        names = set()
+        for path, fragment in fragments.items():
+            names.update(self.fragments[path][1])
+            names.update(fragment[1])
+        self.fragments.update(fragments)
+
+        try:
+            patched = self.patch(*self.merge(), names)
+        except ValueError:
+            patched = False
+
+        if not patched:
+            self.load()
+            return None
+
+        data = dict(self.parser.tables)
+        roots = {k for k, v in data.items() if self.data.get(k) is not v} | (self.data.keys() - data.keys())
+        self.data = data
+        self.model.update(roots)
+        return roots
+
+
+@contextlib.contextmanager
+def sink(path=None, compress=False):
+    """Open a buffered text stream to a file, or to stdout, with optional gzip compression."""
+    if path is None and not compress:
+        yield sys.stdout
+        return
+
+    with contextlib.ExitStack() as stack:
+        raw = sys.stdout.buffer if path is None else stack.enter_context(open(path, "wb"))
+        if compress:
+            # No name or timestamp in the header, so that identical output gives identical files
+            raw = stack.enter_context(gzip.GzipFile(filename="", fileobj=raw, mode="wb", mtime=0))
+        rv = stack.enter_context(io.TextIOWrapper(raw, encoding="utf-8", newline="\n"))
+        yield rv
+        rv.flush()
+
+
+def write(lines, stream, chunk=4096):
+    """Write lines to a stream in chunks, returning the number of lines written."""
+    rv = 0
+    lines = iter(lines)
+    while True:
+        block = list(itertools.islice(lines, chunk))
+        if not block:
+            return rv
+        stream.write("\n".join(block))
+        stream.write("\n")
+        rv += len(block)
+
+
+def permissions(path):
+    """
+    Return the permissions of a file, or those which open() would give a new one.
+
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def publish(lines, path, compress=False):
+    """
+    Write lines to a file, which is left untouched if its contents would not change.
+
+    Returns the number of lines, and whether the file was replaced.
+
+    """
+    path = pathlib.Path(path)
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    os.close(fd)
+    try:
+        with sink(name, compress=compress) as stream:
+            n = write(lines, stream)
+        if path.exists() and filecmp.cmp(name, path, shallow=False):
+            return n, False
+        os.chmod(name, permissions(path))
+        os.replace(name, path)
+        return n, True
+    finally:
+        if os.path.exists(name):
+            os.unlink(name)
+
+
+def render(model, name, args):
+    if args.cluster:
+        return model.to_cluster(name=name, label=args.label_graph, directed=args.digraph, strict=False)
+    else:
+        return model.to_dot(name=name, label=args.label_graph, directed=args.digraph, strict=False)
+
+
+def watch(args):
+    if args.output is None:
+        print("Watch mode needs an --output file.", file=sys.stderr)
+        return 2
+
+    watcher = Watcher(args.input)
+    build = Build(args.input, args=args, workers=args.jobs)
+    name = pathlib.Path(args.input[0]).stem
+    compress = args.gzip or args.output.suffix == ".gz"
+    pending = set()
+    while True:
+        try:
+            if pending:
+                build.update(sorted(pending, key=build.paths.index))
+                pending.clear()
+            n, changed = publish(render(build.model, name, args), args.output, compress=compress)
+        except (configparser.Error, KeyError, ValueError) as e:
+            # Files part way through a save may fail to decode or to parse
+            print("Error:", e, file=sys.stderr)
+        else:
+            if changed:
+                print("Generated", n, "lines of output.", file=sys.stderr)
+            else:
+                print("Output unchanged.", file=sys.stderr)
+
+        paths = next(watcher.poll(args.interval))
+        for path in paths:
+            print("Changed", pathlib.Path(path).resolve(), file=sys.stderr)
+        pending.update(paths)
+
+
 def main(args):
+    if args.watch:
+        return watch(args)
+
     parser = TOMLParser()
-    paths = parser.read(args.input)
+    paths = parser.read_parallel(args.input, workers=args.jobs)
     if not paths:
         print("No files processed.")
         return 2
 
-    for path in paths:
-        print("Processed", pathlib.Path(path).resolve(), file=sys.stderr)
-
-    name = pathlib.Path(paths[0]).stem
+    for path, seconds in paths.items():
+        print("Processed", pathlib.Path(path).resolve(), f"in {seconds:.3f}s", file=sys.stderr)
 
-    model = Model(parser.write_string(), parser.tables, args=args)
-    if args.cluster:
-        writer = model.to_cluster(name=name, label=args.label_graph, directed=args.digraph, strict=False)
-    else:
-        writer = model.to_dot(name=name, label=args.label_graph, directed=args.digraph, strict=False)
+    name = pathlib.Path(next(iter(paths))).stem
 
-    lines = list(writer)
-    print(*lines, sep="\n", file=sys.stdout)
-    print("Generated", len(lines), "lines of output.", file=sys.stderr)
+    model = Model.from_parser(parser, args=args, keep_data=False)
+    compress = args.gzip or (args.output is not None and args.output.suffix == ".gz")
+    with sink(args.output, compress=compress) as stream:
+        n = write(render(model, name, args), stream)
+    print("Generated", n, "lines of output.", file=sys.stderr)
 
 
 def parser():
@@ -337,6 +618,26 @@ def parser():
         "--digraph", "--directed", default=False, action="store_true",
         help="Make arcs directional."
     )
+    rv.add_argument(
+        "--output", default=None, type=pathlib.Path,
+        help="Write output to a file rather than stdout. A '.gz' suffix implies --gzip."
+    )
+    rv.add_argument(
+        "--gzip", default=False, action="store_true",
+        help="Compress output with gzip."
+    )
+    rv.add_argument(
+        "--jobs", default=1, type=int,
+        help="Set the number of processes which read input files."
+    )
+    rv.add_argument(
+        "--watch", default=False, action="store_true",
+        help="Keep watching the input files, and write the output again when they change."
+    )
+    rv.add_argument(
+        "--interval", default=1.0, type=float,
+        help="Set the number of seconds between checks for changes in watch mode."
+    )
     rv.add_argument(
         "input", nargs="+", type=pathlib.Path,
         help="Set input file."
@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) 2022 tundish
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+# USA
+
+"""
+Polls files for changes to their modification time or size.
+
+"""
+
+import os
+import time
+
+
+class Watcher:
+
+    @staticmethod
+    def stat(path):
+        try:
+            rv = os.stat(path)
+        except OSError:
+            return None
+        return (rv.st_mtime_ns, rv.st_size)
+
+    def __init__(self, paths):
+        self.state = {path: self.stat(path) for path in paths}
+
+    def changes(self):
+        """Return the paths which have changed since the last call."""
+        rv = []
+        for path, state in self.state.items():
+            current = self.stat(path)
+            if current != state:
+                self.state[path] = current
+                rv.append(path)
+        return rv
+
+    def poll(self, interval=1.0):
+        """Generate a list of changed paths each time one or more files change."""
+        while True:
+            rv = self.changes()
+            if rv:
+                yield rv
+            else:
+                time.sleep(interval)